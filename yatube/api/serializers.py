@@ -0,0 +1,43 @@
+from django.urls import reverse
+
+POST_FIELDS = ('id', 'text', 'pub_date', 'author', 'group', 'image',
+               'comment_count', 'last_comment_at', 'url')
+COMMENT_FIELDS = ('id', 'post', 'author', 'text', 'created')
+
+
+def requested_fields(request, allowed):
+    """
+    Разреженный набор полей из ?fields=id,text. Неизвестные поля
+    пропускаются, без параметра отдаются все.
+    """
+    fields = [name.strip() for name in request.GET.get('fields', '').split(
+        ',') if name.strip() in allowed]
+    return fields or list(allowed)
+
+
+def post_to_dict(request, post, fields=POST_FIELDS):
+    getters = {
+        'id': lambda: post.pk,
+        'text': lambda: post.text,
+        'pub_date': lambda: post.pub_date,
+        'author': lambda: post.author.username,
+        'group': lambda: post.group.slug if post.group_id else None,
+        'image': lambda: (request.build_absolute_uri(post.image.url)
+                          if post.image else None),
+        'comment_count': lambda: post.comment_count,
+        'last_comment_at': lambda: post.last_comment_at,
+        'url': lambda: request.build_absolute_uri(
+            reverse('api:post', args=(post.pk,))),
+    }
+    return {name: getters[name]() for name in fields}
+
+
+def comment_to_dict(request, comment, fields=COMMENT_FIELDS):
+    getters = {
+        'id': lambda: comment.pk,
+        'post': lambda: comment.post_id,
+        'author': lambda: comment.author.username,
+        'text': lambda: comment.text,
+        'created': lambda: comment.created,
+    }
+    return {name: getters[name]() for name in fields}
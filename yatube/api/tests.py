@@ -0,0 +1,167 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import Client, TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts.cache import VERSION_KEY
+from posts.models import Comment, Follow, Group, Post, User
+
+
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.group = Group.objects.create(title='TestGroup', slug='test_slug')
+        Post.objects.bulk_create(
+            Post(author=cls.author, group=cls.group, text=f'Пост {number}')
+            for number in range(13))
+        cls.post = Post.objects.order_by('-pk').first()
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.reader)
+
+    def test_feeds_use_cursor_pagination(self):
+        """Ленты отдают страницу и ссылку на следующую по курсору...............
+        """
+        urls = (reverse('api:posts'),
+                reverse('api:group', kwargs={'slug': self.group.slug}),
+                reverse('api:profile',
+                        kwargs={'username': self.author.username}))
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(len(data['results']), 10)
+                self.assertEqual(data['results'][0]['id'], self.post.pk)
+                data = self.client.get(data['next']).json()
+                self.assertEqual(len(data['results']), 3)
+                self.assertIsNone(data['next'])
+
+    def test_sparse_fields(self):
+        """Параметр fields ограничивает набор полей.............................
+        """
+        data = self.client.get(reverse('api:post', args=(self.post.pk,)),
+                               {'fields': 'id,text,unknown'}).json()
+        self.assertEqual(data, {'id': self.post.pk, 'text': self.post.text})
+
+    def test_not_modified_without_feed_query(self):
+        """Повторный запрос с ETag получает 304 без выборки ленты...............
+        """
+        url = reverse('api:posts')
+        response = self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_follow_and_feed(self):
+        """Подписка через API наполняет ленту подписок..........................
+        """
+        url = reverse('api:follow', kwargs={'username': self.author.username})
+        self.assertEqual(self.client.post(url).status_code,
+                         HTTPStatus.UNAUTHORIZED)
+        response = self.authorized_user.post(url)
+        self.assertEqual(response.json(), {'following': True})
+        self.assertTrue(Follow.objects.filter(user=self.reader,
+                                              author=self.author).exists())
+        data = self.authorized_user.get(reverse('api:feed')).json()
+        self.assertEqual(data['results'][0]['id'], self.post.pk)
+        self.authorized_user.delete(url)
+        self.assertFalse(Follow.objects.exists())
+
+    def test_writes_need_csrf_token(self):
+        """Пишущие запросы без токена CSRF отклоняются, с токеном проходят......
+        """
+        client = Client(enforce_csrf_checks=True)
+        client.force_login(self.reader)
+        url = reverse('api:follow', kwargs={'username': self.author.username})
+        response = client.post(url)
+        self.assertEqual(response.status_code, HTTPStatus.FORBIDDEN)
+        self.assertIn('detail', response.json())
+        token = client.get(reverse('api:csrf')).json()['csrftoken']
+        self.assertIn('csrftoken', client.cookies)
+        response = client.post(url, HTTP_X_CSRFTOKEN=token)
+        self.assertEqual(response.json(), {'following': True})
+
+    def test_comments(self):
+        """Комментарии создаются и читаются через API...........................
+        """
+        url = reverse('api:comments', args=(self.post.pk,))
+        response = self.authorized_user.post(
+            url, {'text': 'Комментарий'}, content_type='application/json')
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        self.assertTrue(Comment.objects.filter(post=self.post,
+                                               author=self.reader).exists())
+        data = self.client.get(url, {'fields': 'author,text'}).json()
+        self.assertEqual(data['results'], [{'author': 'TestReader',
+                                            'text': 'Комментарий'}])
+
+    def test_discussed_order(self):
+        """Лента по числу комментариев начинается с обсуждаемого поста.........
+        """
+        oldest = Post.objects.order_by('pk').first()
+        self.authorized_user.post(
+            reverse('api:comments', args=(oldest.pk,)),
+            {'text': 'Комментарий'}, content_type='application/json')
+        data = self.client.get(reverse('api:posts'), {
+            'order': 'discussed', 'fields': 'id,comment_count'}).json()
+        self.assertEqual(data['results'][0], {'id': oldest.pk,
+                                              'comment_count': 1})
+        self.assertEqual(data['results'][1]['id'], self.post.pk)
+
+    def test_missing_post_is_json_404(self):
+        """Несуществующий пост — 404 в формате JSON.............................
+        """
+        response = self.client.get(reverse('api:post', args=(0,)))
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIn('detail', response.json())
+
+
+class ApiValidatorsTest(TransactionTestCase):
+    def test_new_post_changes_etag(self):
+        """Новая запись меняет ETag ленты.......................................
+        """
+        cache.clear()
+        author = User.objects.create_user(username='TestAuthor')
+        url = reverse('api:posts')
+        etag = Client().get(url)['ETag']
+        Post.objects.create(author=author, text='Новый пост')
+        response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.json()['results'][0]['text'], 'Новый пост')
+
+    def test_post_etag_follows_author_and_group(self):
+        """Новое имя автора или адрес группы меняют ETag поста..................
+        """
+        cache.clear()
+        author = User.objects.create_user(username='TestAuthor')
+        group = Group.objects.create(title='TestGroup', slug='test_slug')
+        post = Post.objects.create(author=author, group=group, text='Пост')
+        url = reverse('api:post', args=(post.pk,))
+        client = Client()
+        for obj, field, value in ((author, 'username', 'RenamedAuthor'),
+                                  (group, 'slug', 'renamed_slug')):
+            with self.subTest(field=field):
+                etag = client.get(url)['ETag']
+                setattr(obj, field, value)
+                obj.save()
+                response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+                self.assertIn(value, response.json().values())
+
+    def test_missing_post_creates_no_versions(self):
+        """Запрос несуществующего поста не заводит ключей поколений.............
+        """
+        cache.clear()
+        for name in ('api:post', 'api:comments'):
+            response = Client().get(reverse(name, args=(10 ** 6,)))
+            self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        self.assertIsNone(cache.get(VERSION_KEY.format(f'post:{10 ** 6}')))
@@ -0,0 +1,17 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('csrf/', views.csrf, name='csrf'),
+    path('posts/', views.posts, name='posts'),
+    path('posts/<int:post_id>/', views.post_detail, name='post'),
+    path('posts/<int:post_id>/comments/', views.comments, name='comments'),
+    path('groups/<slug:slug>/posts/', views.group_posts, name='group'),
+    path('users/<str:username>/posts/', views.profile_posts,
+         name='profile'),
+    path('users/<str:username>/follow/', views.follow, name='follow'),
+    path('feed/', views.follow_feed, name='feed'),
+]
@@ -0,0 +1,194 @@
+import json
+from functools import wraps
+from http import HTTPStatus
+
+from django.http import Http404, JsonResponse
+from django.middleware.csrf import get_token
+from django.shortcuts import get_object_or_404
+from django.views import csrf as csrf_views
+from django.views.decorators.csrf import ensure_csrf_cookie
+from django.views.decorators.http import require_http_methods
+
+from posts import counters, timeline
+from posts.cards import GROUPS_SCOPE
+from posts.conditional import (conditional, follow_validators,
+                               group_validators, profile_validators,
+                               scope_validators)
+from posts.forms import CommentForm, PostForm
+from posts.models import DISCUSSED_ORDERING, Group, Post, User
+from posts.paginator import paginate
+from posts.views import comments_page
+
+from .serializers import (COMMENT_FIELDS, POST_FIELDS, comment_to_dict,
+                          post_to_dict, requested_fields)
+
+
+def error(status, detail, **extra):
+    return JsonResponse({'detail': detail, **extra}, status=status)
+
+
+def api_view(methods, login_methods=()):
+    """
+    Общая обвязка JSON-представлений: допустимые методы, проверка
+    авторизации для пишущих методов и 404 в виде JSON.
+    """
+    def decorator(view):
+        @wraps(view)
+        @require_http_methods(methods)
+        def wrapper(request, *args, **kwargs):
+            if (request.method in login_methods
+                    and not request.user.is_authenticated):
+                return error(HTTPStatus.UNAUTHORIZED,
+                             'Требуется авторизация')
+            try:
+                return view(request, *args, **kwargs)
+            except Http404:
+                return error(HTTPStatus.NOT_FOUND, 'Не найдено')
+        return wrapper
+    return decorator
+
+
+@api_view(('GET',))
+@ensure_csrf_cookie
+def csrf(request):
+    """
+    Токен для пишущих запросов: API работает на сессии сайта, поэтому
+    POST и DELETE передают его в заголовке X-CSRFToken вместе с cookie
+    csrftoken, которую ставит этот ответ.
+    """
+    return JsonResponse({'csrftoken': get_token(request)})
+
+
+def csrf_failure(request, reason=''):
+    """CSRF_FAILURE_VIEW: для API — ошибка в JSON, для сайта — как было."""
+    if getattr(request.resolver_match, 'namespace', None) == 'api':
+        return error(HTTPStatus.FORBIDDEN, f'Ошибка CSRF: {reason}')
+    return csrf_views.csrf_failure(request, reason)
+
+
+def request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body)
+        except ValueError:
+            return {}
+        return data if isinstance(data, dict) else {}
+    return request.POST
+
+
+def link(request, cursor):
+    if not cursor:
+        return None
+    query = request.GET.copy()
+    query.pop('page', None)
+    query['cursor'] = cursor
+    return request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+
+
+def feed_response(request, post_list, **kwargs):
+    """Страница ленты по курсору без подсчёта всех записей."""
+    page = paginate(request, post_list, approximate=True, **kwargs)
+    fields = requested_fields(request, POST_FIELDS)
+    return JsonResponse({
+        'results': [post_to_dict(request, post, fields) for post in page],
+        'next': link(request, page.next_cursor),
+        'previous': link(request, page.previous_cursor)})
+
+
+@api_view(('GET', 'POST'), login_methods=('POST',))
+@conditional(lambda request: scope_validators('index'))
+def posts(request):
+    if request.method == 'POST':
+        form = PostForm(request_data(request), files=request.FILES or None)
+        if not form.is_valid():
+            return error(HTTPStatus.BAD_REQUEST, 'Неверные данные',
+                         errors=form.errors)
+        post = form.save(commit=False)
+        post.author = request.user
+        counters.publish_post(post)
+        return JsonResponse(post_to_dict(request, post),
+                            status=HTTPStatus.CREATED)
+    if request.GET.get('order') == 'discussed':
+        return feed_response(request, Post.objects.feed(),
+                             ordering=DISCUSSED_ORDERING)
+    return feed_response(request, Post.objects.feed())
+
+
+def post_validators(request, post_id):
+    """
+    Пост со встроенными автором и группой. Для несуществующего поста
+    поколения не заводятся: ключи не копятся от чужих id.
+    """
+    author_id = Post.objects.filter(pk=post_id).values_list(
+        'author_id', flat=True).first()
+    if author_id is None:
+        return None
+    return scope_validators(f'post:{post_id}', f'profile:{author_id}',
+                            GROUPS_SCOPE)
+
+
+@api_view(('GET',))
+@conditional(post_validators)
+def post_detail(request, post_id):
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    fields = requested_fields(request, POST_FIELDS)
+    return JsonResponse(post_to_dict(request, post, fields))
+
+
+@api_view(('GET', 'POST'), login_methods=('POST',))
+@conditional(post_validators)
+def comments(request, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             pk=post_id)
+    if request.method == 'POST':
+        form = CommentForm(request_data(request))
+        if not form.is_valid():
+            return error(HTTPStatus.BAD_REQUEST, 'Неверные данные',
+                         errors=form.errors)
+        comment = form.save(commit=False)
+        comment.author = request.user
+        comment.post = post
+        counters.add_comment(comment)
+        return JsonResponse(comment_to_dict(request, comment),
+                            status=HTTPStatus.CREATED)
+    page = comments_page(request, post)
+    fields = requested_fields(request, COMMENT_FIELDS)
+    return JsonResponse({
+        'results': [comment_to_dict(request, comment, fields)
+                    for comment in page],
+        'next': link(request, page.next_cursor),
+        'previous': link(request, page.previous_cursor)})
+
+
+@api_view(('GET',))
+@conditional(group_validators)
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed_response(request, Post.objects.feed().filter(group=group))
+
+
+@api_view(('GET',))
+@conditional(profile_validators)
+def profile_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed_response(request, Post.objects.feed().filter(author=author))
+
+
+@api_view(('GET',), login_methods=('GET',))
+@conditional(follow_validators)
+def follow_feed(request):
+    return feed_response(request, timeline.follow_feed(request.user),
+                         ordering=timeline.ORDERING)
+
+
+@api_view(('POST', 'DELETE'), login_methods=('POST', 'DELETE'))
+def follow(request, username):
+    author = get_object_or_404(User, username=username)
+    if author == request.user:
+        return error(HTTPStatus.BAD_REQUEST,
+                     'Нельзя подписаться на самого себя')
+    if request.method == 'POST':
+        counters.follow(request.user, author)
+        return JsonResponse({'following': True})
+    counters.unfollow(request.user, author)
+    return JsonResponse({'following': False})
@@ -1,5 +1,7 @@
+from django.conf import settings
 from django.contrib import admin
 
+from . import counters, search
 from .models import Comment, Follow, Group, Post, Profile
 
 
@@ -9,6 +11,20 @@ class PostAdmin(admin.ModelAdmin):
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по полнотекстовому индексу вместо LIKE по тексту."""
+        if not search_term:
+            return queryset, False
+        ids = search.SearchResults(search_term).ids(
+            0, settings.SEARCH_ADMIN_LIMIT)
+        return queryset.filter(pk__in=ids), False
+
+    def save_model(self, request, obj, form, change):
+        if change:
+            counters.edit_post(obj)
+        else:
+            super().save_model(request, obj, form, change)
+
 
 class GroupAdmin(admin.ModelAdmin):
     list_display = ('pk', 'title', 'slug', 'description')
@@ -3,3 +3,11 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from yatube.database import configure_sqlite
+
+        from . import signals  # noqa: F401
+        connection_created.connect(configure_sqlite)
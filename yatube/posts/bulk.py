@@ -0,0 +1,67 @@
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.cache import cache as django_cache
+
+from . import cache, counters, search, timeline
+from .cache import USER_COUNT_KEY
+from .models import Group, Profile
+
+
+@contextmanager
+def preserve_dates(*models):
+    """
+    Отключает auto_now/auto_now_add у полей моделей, чтобы bulk_create
+    сохранил заданные даты (исторические записи, синтетические данные).
+    """
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False)
+              or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def bulk_insert(model, objects, batch_size=1000, **kwargs):
+    """
+    bulk_create для генератора: объекты создаются и пишутся пачками,
+    поэтому в памяти не больше batch_size строк. Возвращает их число.
+    """
+    objects = iter(objects)
+    total = 0
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return total
+        # размер одного INSERT выбирает бэкенд: у SQLite свои пределы
+        model.objects.bulk_create(batch, **kwargs)
+        total += len(batch)
+
+
+def refresh_derived(batch_size=1000):
+    """
+    Делает после bulk_create то, что обычно делают сигналы: создаёт
+    недостающие профили и пересчитывает счётчики профилей и постов,
+    пересобирает ленты подписок и поисковый индекс, сбрасывает кеш лент.
+    """
+    counters.rebuild_counters()
+    counters.rebuild_comment_counters()
+    timeline.rebuild_feeds()
+    search.rebuild()
+    scopes = ['index']
+    scopes += [f'group:{pk}' for pk in Group.objects.values_list(
+        'pk', flat=True).iterator()]
+    for user_id in Profile.objects.values_list('user_id', flat=True
+                                               ).iterator():
+        scopes += [f'profile:{user_id}', f'follow:{user_id}']
+        if len(scopes) >= batch_size:
+            cache.bump(*scopes)
+            scopes = []
+    if scopes:
+        cache.bump(*scopes)
+    django_cache.delete(USER_COUNT_KEY)
@@ -0,0 +1,126 @@
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import get_cache_key, has_vary_header, learn_cache_key
+
+from . import stampede
+from .models import Profile
+
+USER_COUNT_KEY = 'user_count'
+VERSION_KEY = 'feed_version:{}'
+
+
+def get_user_count():
+    """
+    Число пользователей из кеша. По истечении USER_COUNT_TIMEOUT
+    значение пересчитывается целиком, между пересчётами его
+    поддерживают сигналы создания и удаления профилей.
+    """
+    count = cache.get(USER_COUNT_KEY)
+    if count is None:
+        count = Profile.objects.count()
+        cache.set(USER_COUNT_KEY, count, settings.USER_COUNT_TIMEOUT)
+    return count
+
+
+def change_user_count(delta):
+    try:
+        cache.incr(USER_COUNT_KEY, delta)
+    except ValueError:
+        # ключа нет — его пересчитает следующее чтение
+        pass
+
+
+def _now():
+    return time.time_ns() // 1000
+
+
+def get_versions(*scopes):
+    """
+    Поколения областей ленты: 'index', 'group:<id>', 'profile:<id>',
+    'post:<id>', 'follow:<id>' (подписки пользователя). Поколение —
+    время последнего изменения в микросекундах, потерянное поколение
+    заводится заново, что сбрасывает кеш области.
+    """
+    keys = {VERSION_KEY.format(scope): scope for scope in scopes}
+    versions = cache.get_many(keys)
+    missing = {key: _now() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, None)
+        versions.update(missing)
+    return {keys[key]: version for key, version in versions.items()}
+
+
+def get_version(*scopes):
+    """Общее поколение нескольких областей — самое свежее из них."""
+    return max(get_versions(*scopes).values())
+
+
+def bump(*scopes):
+    now = _now()
+    cache.set_many({VERSION_KEY.format(scope): now for scope in scopes}, None)
+
+
+def post_scopes(post_id, author_id, group_id=None):
+    scopes = ['index', f'post:{post_id}', f'profile:{author_id}']
+    if group_id:
+        scopes.append(f'group:{group_id}')
+    return scopes
+
+
+class _Uncacheable(Exception):
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def cache_feed(timeout, key_prefix, scopes=('index',)):
+    """
+    Замена cache_page. Страница хранится вместе с поколением областей
+    ленты: новая запись сразу делает её устаревшей, поэтому TTL можно
+    держать длинным. Устаревшую страницу пересчитывает один процесс,
+    остальные в это время отдают прежнюю (см. posts.stampede).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            version = get_version(*scopes)
+
+            def render():
+                response = view(request, *args, **kwargs)
+                if not _cacheable(request, response):
+                    raise _Uncacheable(response)
+                learn_cache_key(request, response,
+                                timeout + settings.CACHE_STALE_TIMEOUT,
+                                key_prefix, cache=cache)
+                return response
+
+            cache_key = get_cache_key(request, key_prefix, 'GET',
+                                      cache=cache)
+            try:
+                if cache_key is not None:
+                    return stampede.get_or_set(cache_key, render, timeout,
+                                               version)
+                response = render()
+            except _Uncacheable as uncacheable:
+                return uncacheable.response
+            stampede.store(get_cache_key(request, key_prefix, 'GET',
+                                         cache=cache),
+                           response, timeout, version)
+            stampede.record(stampede.MISS)
+            return response
+        return wrapper
+    return decorator
+
+
+def _cacheable(request, response):
+    if response.streaming or response.status_code != 200:
+        return False
+    if (not request.COOKIES and response.cookies
+            and has_vary_header(response, 'Cookie')):
+        return False
+    return 'private' not in response.get('Cache-Control', '')
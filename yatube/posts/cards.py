@@ -0,0 +1,87 @@
+"""
+Кеш карточек постов.
+
+Карточка post_item.html не зависит от читателя, кроме кнопки правки
+для автора: она хранится в кеше по id поста и поколениям поста, его
+автора и групп, а кнопка подставляется на место метки EDIT_MARKER уже
+после выборки. Карточки страницы читаются одним get_many, рендерятся
+только недостающие. stream_cards() отдаёт карточки пачками для
+потоковых страниц.
+"""
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from yatube.metrics import record_cache
+from yatube.routers import replica_settled
+
+from .cache import get_versions
+
+CARD_KEY = 'post_card:{}:{}'
+EDIT_MARKER = '<!-- edit-button -->'
+# место карточек в шаблоне потоковой страницы
+STREAM_MARKER = '<!-- post-cards -->'
+# переименование группы меняет все карточки её постов
+GROUPS_SCOPE = 'groups'
+
+
+def render_cards(posts, user=None, detail=False):
+    """
+    HTML карточек постов подряд. detail=True — карточка на странице
+    самого поста, без кнопки «Просмотр».
+    """
+    posts = list(posts)
+    if not posts:
+        return ''
+    variant = 'detail' if detail else 'feed'
+    # имя и ссылка автора в карточке меняются вместе с его профилем
+    authors = {post.author_id for post in posts}
+    versions = get_versions(
+        GROUPS_SCOPE, *(f'post:{post.pk}' for post in posts),
+        *(f'profile:{author_id}' for author_id in authors))
+    groups = versions.pop(GROUPS_SCOPE)
+    keys = {post.pk: CARD_KEY.format(post.pk, variant) for post in posts}
+    cached = cache.get_many(keys.values())
+    missing = {}
+    cards = []
+    for post in posts:
+        version = max(versions[f'post:{post.pk}'],
+                      versions[f'profile:{post.author_id}'], groups)
+        entry = cached.get(keys[post.pk])
+        if entry is not None and entry[0] == version:
+            record_cache('card_hit')
+            card = entry[1]
+        else:
+            record_cache('card_miss')
+            card = render_to_string('posts/post_item.html', {
+                'post': post, 'detail': detail})
+            missing[keys[post.pk]] = (version, card)
+        if user is not None and user.pk == post.author_id:
+            card = card.replace(EDIT_MARKER, render_to_string(
+                'posts/edit_button.html', {'post': post}))
+        cards.append(card)
+    if missing:
+        timeout = settings.FEED_CACHE_TIMEOUT
+        newest = max(version for version, _ in missing.values())
+        if not replica_settled(newest / 10 ** 6):
+            # посты могли прочитать с реплики, куда правка ещё не дошла,
+            # как и в stampede.store
+            timeout = min(timeout, settings.DATABASE_REPLICA_LAG)
+        cache.set_many(missing, timeout)
+    return mark_safe(''.join(cards))
+
+
+def stream_cards(posts, user=None, chunk_size=100):
+    """
+    Карточки пачками по chunk_size по мере чтения итератора posts:
+    в памяти не больше одной пачки постов и их HTML.
+    """
+    posts = iter(posts)
+    while True:
+        chunk = list(islice(posts, chunk_size))
+        if not chunk:
+            return
+        yield render_cards(chunk, user)
@@ -0,0 +1,119 @@
+import hashlib
+from datetime import datetime, timezone
+
+from django.utils.timezone import is_naive, make_aware
+from django.views.decorators.http import condition
+
+from yatube.routers import replica_settled
+
+from .cache import get_version
+from .cards import GROUPS_SCOPE
+from .models import Follow, Group, Post, User
+
+
+def _moment(version):
+    return datetime.fromtimestamp(version / 10 ** 6, tz=timezone.utc)
+
+
+def _aware(moment):
+    # при USE_TZ = False база возвращает наивное местное время
+    return make_aware(moment) if is_naive(moment) else moment
+
+
+def scope_validators(*scopes):
+    """Валидаторы по поколениям областей ленты: (метка, время изменения)."""
+    version = get_version(*scopes)
+    return str(version), _moment(version)
+
+
+def viewer_scopes(request):
+    """Подписки читателя меняют кнопки «Подписаться» на страницах."""
+    if request.user.is_authenticated:
+        return [f'follow:{request.user.pk}']
+    return []
+
+
+def follow_validators(request):
+    """
+    Лента подписок: подписки самого читателя и профили всех авторов,
+    на которых он подписан. Хватает одного запроса к Follow.
+    """
+    authors = Follow.objects.filter(user=request.user).values_list(
+        'author_id', flat=True)
+    return scope_validators(*viewer_scopes(request), *(
+        f'profile:{author_id}' for author_id in authors))
+
+
+def group_validators(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True).first()
+    if group_id is None:
+        return None
+    return scope_validators('index', f'group:{group_id}',
+                            *viewer_scopes(request))
+
+
+def profile_validators(request, username):
+    user_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True).first()
+    if user_id is None:
+        return None
+    # карточки выводят название группы
+    return scope_validators(f'profile:{user_id}', GROUPS_SCOPE,
+                            *viewer_scopes(request))
+
+
+def post_validators(request, username, post_id):
+    """
+    Страница поста: время правки, число комментариев и время последнего
+    из них одним запросом, плюс поколения профиля автора и групп для
+    карточки.
+    """
+    rows = Post.objects.filter(
+        pk=post_id, author__username=username).order_by().values_list(
+        'author_id', 'updated', 'comment_count', 'last_comment_at')
+    # срез вместо first(): сортировка одной строки по pk не нужна
+    state = next(iter(rows[:1]), None)
+    if state is None:
+        return None
+    author_id, updated, comments, last_comment = state
+    token, modified = scope_validators(f'profile:{author_id}', GROUPS_SCOPE,
+                                       *viewer_scopes(request))
+    moments = [_aware(moment) for moment in (modified, updated, last_comment)
+               if moment is not None]
+    return f'{token}:{updated}:{comments}:{last_comment}', max(moments)
+
+
+def conditional(validators):
+    """
+    Декоратор condition с дешёвыми валидаторами вместо рендеринга.
+
+    validators(request, *args, **kwargs) возвращает пару
+    (метка, время изменения) или None, если объекта нет. ETag учитывает
+    ещё читателя и полный адрес запроса. Повторный запрос получает 304
+    без выборки ленты и рендеринга шаблона. Пока свежие изменения
+    не дошли до реплик, валидаторы не отдаются: иначе клиент запомнил
+    бы новую метку вместе со старой страницей.
+    """
+    def current(request, *args, **kwargs):
+        if not hasattr(request, '_validators'):
+            state = validators(request, *args, **kwargs)
+            if state is not None and not replica_settled(
+                    state[1].timestamp()):
+                state = None
+            request._validators = state
+        return request._validators
+
+    def etag(request, *args, **kwargs):
+        state = current(request, *args, **kwargs)
+        if state is None:
+            return None
+        viewer = request.user.pk if request.user.is_authenticated else 0
+        key = f'{state[0]}:{viewer}:{request.get_full_path()}'
+        return hashlib.md5(key.encode()).hexdigest()
+
+    def last_modified(request, *args, **kwargs):
+        state = current(request, *args, **kwargs)
+        return state and state[1]
+
+    return condition(etag_func=etag, last_modified_func=last_modified)
@@ -0,0 +1,138 @@
+from django.db import transaction
+from django.db.models import (Count, F, IntegerField, Max, OuterRef, Q,
+                              Subquery)
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, Profile, User
+
+# меняются только add_comment и delete_comment, правка поста их не трогает
+COMMENT_FIELDS = ('comment_count', 'last_comment_at')
+
+
+def _add(user_id, **deltas):
+    Profile.objects.filter(user_id=user_id).update(
+        **{field: F(field) + delta for field, delta in deltas.items()})
+
+
+def follow(user, author):
+    with transaction.atomic():
+        _, created = Follow.objects.get_or_create(user=user, author=author)
+        if created:
+            _add(user.pk, following_count=1)
+            _add(author.pk, followers_count=1)
+    return created
+
+
+def unfollow(user, author):
+    with transaction.atomic():
+        deleted, _ = Follow.objects.filter(user=user, author=author).delete()
+        if deleted:
+            _add(user.pk, following_count=-deleted)
+            _add(author.pk, followers_count=-deleted)
+    return deleted
+
+
+def publish_post(post):
+    with transaction.atomic():
+        post.save()
+        _add(post.author_id, posts_count=1)
+    return post
+
+
+def edit_post(post):
+    """Сохраняет правку поста, не затирая счётчики комментариев."""
+    post.save(update_fields=[
+        field.name for field in Post._meta.concrete_fields
+        if not field.primary_key and field.name not in COMMENT_FIELDS])
+    return post
+
+
+def delete_post(post):
+    with transaction.atomic():
+        post.delete()
+        _add(post.author_id, posts_count=-1)
+
+
+def add_comment(comment):
+    with transaction.atomic():
+        comment.save()
+        Post.objects.filter(pk=comment.post_id).update(
+            comment_count=F('comment_count') + 1,
+            last_comment_at=comment.created)
+    return comment
+
+
+def delete_comment(comment):
+    # счётчики поста уменьшает discount_comment из сигнала post_delete
+    with transaction.atomic():
+        comment.delete()
+
+
+def discount_comment(comment):
+    """
+    Уменьшает счётчик поста после удаления комментария, в том числе
+    каскадного вместе с автором. Время последнего берётся из оставшихся
+    по индексу (post, created).
+    """
+    Post.objects.filter(pk=comment.post_id).update(
+        comment_count=F('comment_count') - 1,
+        last_comment_at=Subquery(Comment.objects.filter(
+            post=OuterRef('pk')).order_by('-created').values(
+            'created')[:1]))
+
+
+def _count(queryset, field):
+    counts = queryset.filter(**{field: OuterRef('user_id')}).order_by(
+    ).values(field).annotate(count=Count('pk')).values('count')
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+def rebuild_counters():
+    """
+    Пересчитывает счётчики всех профилей одним UPDATE.
+    Возвращает число профилей, в которых счётчики разошлись.
+    """
+    missing = User.objects.filter(profile__isnull=True)
+    Profile.objects.bulk_create(
+        Profile(user=user) for user in missing.iterator())
+    expected = {
+        'posts_count': _count(Post.objects.all(), 'author'),
+        'followers_count': _count(Follow.objects.all(), 'author'),
+        'following_count': _count(Follow.objects.all(), 'user'),
+    }
+    stale = Profile.objects.annotate(
+        **{f'expected_{field}': value for field, value in expected.items()}
+    ).exclude(**{field: F(f'expected_{field}') for field in expected})
+    changed = stale.count()
+    if changed:
+        Profile.objects.update(**expected)
+    return changed
+
+
+def rebuild_comment_counters():
+    """
+    Пересчитывает число и время последнего комментария постов.
+    Возвращает число постов, в которых они разошлись.
+    """
+    comments = Comment.objects.filter(post=OuterRef('pk')).order_by(
+    ).values('post')
+    expected = {
+        'comment_count': Coalesce(Subquery(
+            comments.annotate(count=Count('pk')).values('count'),
+            output_field=IntegerField()), 0),
+        'last_comment_at': Subquery(
+            comments.annotate(last=Max('created')).values('last')),
+    }
+    stale = Post.objects.order_by().annotate(
+        expected_count=expected['comment_count'],
+        expected_last=expected['last_comment_at']).filter(
+        ~Q(comment_count=F('expected_count'))
+        # NULL = NULL ложно, поэтому даты сравниваются неравенствами
+        | Q(last_comment_at__lt=F('expected_last'))
+        | Q(last_comment_at__gt=F('expected_last'))
+        | Q(last_comment_at__isnull=True, expected_last__isnull=False)
+        | Q(last_comment_at__isnull=False, expected_last__isnull=True))
+    changed = stale.count()
+    if changed:
+        Post.objects.update(**expected)
+    return changed
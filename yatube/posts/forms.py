@@ -1,9 +1,12 @@
 from django import forms
 
 from .models import Comment, Post, User, Profile
+from .uploads import NormalizedImagesMixin
 
 
-class PostForm(forms.ModelForm):
+class PostForm(NormalizedImagesMixin, forms.ModelForm):
+    normalized_images = ('image',)
+
     class Meta:
         model = Post
         fields = ('text', 'group', 'image')
@@ -13,6 +16,9 @@ class PostForm(forms.ModelForm):
         labels = {'text': 'Текст', 'group': 'Группа', 'image': 'изображение'}
         widgets = {'text': forms.Textarea()}
 
+    def clean_image(self):
+        return self.clean_normalized('image')
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
@@ -26,7 +32,12 @@ class UserEditForm(forms.ModelForm):
         fields = ('first_name', 'last_name', 'email')
 
 
-class ProfileEditForm(forms.ModelForm):
+class ProfileEditForm(NormalizedImagesMixin, forms.ModelForm):
+    normalized_images = ('photo',)
+
     class Meta:
         model = Profile
         fields = ('date_of_birth', 'photo')
+
+    def clean_photo(self):
+        return self.clean_normalized('photo')
@@ -0,0 +1,227 @@
+import json
+import re
+import statistics
+import subprocess
+import time
+
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Follow, Group, Post, Profile, User
+from yatube.templating import template_loaders, warm_templates
+
+TEMPLATE_TIMING = re.compile(r'tpl;dur=([\d.]+)')
+# профили загрузки шаблонов для --compare-templates
+TEMPLATE_PROFILES = (('development', False), ('production', True))
+# очищается только свой кеш: общий хранит страницы рабочей базы
+BENCHMARK_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    },
+}
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * share), len(ordered) - 1)]
+
+
+def render_ms(response):
+    """Время рендеринга шаблонов из заголовка Server-Timing."""
+    return float(TEMPLATE_TIMING.search(response['Server-Timing']).group(1))
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ('git', 'rev-parse', '--short', 'HEAD'), capture_output=True,
+            text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержку, пропускную способность и число запросов '
+            'горячих страниц через тестовый клиент. По умолчанию создаёт '
+            'временную базу и заполняет её командой seed_data; результаты '
+            'пишутся в JSON для сравнения между коммитами. Бэкенд базы '
+            'выбирается переменной DATABASE_URL.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', default='benchmark.json')
+        parser.add_argument('--existing-db', action='store_true',
+                            help='Мерить на текущей базе без заполнения. '
+                                 'Запускаются только анонимные чтения: '
+                                 'вход пишет сессию и last_login, а '
+                                 'комментарий — в саму базу.')
+        parser.add_argument('--warm-cache', action='store_true',
+                            help='Не очищать кеш перед каждым запросом.')
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--compare-templates', action='store_true',
+                            help='Сравнить время рендеринга страниц без '
+                                 'кеша шаблонов и с ним.')
+
+    def handle(self, *args, **options):
+        setup_test_environment()
+        old_name = None
+        try:
+            if not options['existing_db']:
+                old_name = connection.settings_dict['NAME']
+                connection.creation.create_test_db(verbosity=0)
+                call_command('seed_data', users=options['users'],
+                             posts=options['posts'],
+                             comments=options['comments'],
+                             seed=options['seed'], stdout=self.stdout)
+            with override_settings(CACHES=BENCHMARK_CACHES):
+                results = self.run_scenarios(options)
+                templates = (self.compare_templates(options)
+                             if options['compare_templates'] else None)
+        finally:
+            if old_name is not None:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+        report = {
+            'revision': git_revision(),
+            'database': connection.vendor,
+            'created': timezone.now().isoformat(),
+            'options': {key: options[key] for key in (
+                'iterations', 'existing_db', 'warm_cache', 'users',
+                'posts', 'comments', 'seed', 'compare_templates')},
+            'results': results,
+        }
+        if templates is not None:
+            report['templates'] = templates
+        with open(options['output'], 'w') as output:
+            json.dump(report, output, ensure_ascii=False, indent=2)
+        for name, result in results.items():
+            self.stdout.write(
+                f'{name:14} p50 {result["p50_ms"]:8.1f} ms  '
+                f'p95 {result["p95_ms"]:8.1f} ms  '
+                f'{result["rps"]:7.1f} rps  {result["queries"]} queries')
+        for name, timings in (templates or {}).items():
+            self.stdout.write(f'{name:14} шаблоны: ' + '  '.join(
+                f'{profile} p50 {timing["p50_ms"]:6.2f} ms'
+                for profile, timing in timings.items()))
+        self.stdout.write(self.style.SUCCESS(
+            f'Результаты записаны в {options["output"]}'))
+
+    def scenarios(self, read_only=False):
+        """
+        Пары (имя, функция запроса) для самых частых страниц.
+        read_only=True — только анонимные чтения, без записи в базу.
+        """
+        # самый читаемый из пишущих авторов и самый активный читатель
+        profile = Profile.objects.filter(
+            user__posts__isnull=False).order_by(
+            '-followers_count').select_related('user').first()
+        if profile is None:
+            raise CommandError('В базе нет авторов с постами: заполните её '
+                               'или запустите бенчмарк без --existing-db.')
+        author = profile.user
+        post = Post.objects.filter(author=author).order_by(
+            '-pub_date').first()
+        group = Group.objects.order_by('pk').first()
+        pages = max(Post.objects.count() // 10, 1)
+
+        anonymous = Client()
+        post_args = {'username': author.username, 'post_id': post.pk}
+        scenarios = {
+            'index': lambda: anonymous.get(reverse('index')),
+            'index_deep': lambda: anonymous.get(
+                reverse('index'), {'page': pages // 2 or 1}),
+            'profile': lambda: anonymous.get(
+                reverse('profile', kwargs={'username': author.username})),
+            'post_view': lambda: anonymous.get(
+                reverse('post', kwargs=post_args)),
+        }
+        if group is not None:
+            scenarios['group_posts'] = lambda: anonymous.get(
+                reverse('group', kwargs={'slug': group.slug}))
+        if read_only:
+            return scenarios
+        reader = Follow.objects.values('user').annotate(
+            total=Count('pk')).order_by('-total').first()
+        client = Client()
+        client.force_login(User.objects.get(
+            pk=reader['user'] if reader else author.pk))
+        scenarios['follow_index'] = lambda: client.get(
+            reverse('follow_index'))
+        scenarios['add_comment'] = lambda: client.post(
+            reverse('add_comment', kwargs=post_args),
+            {'text': 'Комментарий из бенчмарка'})
+        return scenarios
+
+    def run_scenarios(self, options):
+        results = {}
+        scenarios = self.scenarios(read_only=options['existing_db'])
+        for name, request in scenarios.items():
+            request()
+            timings = []
+            queries = 0
+            for _ in range(options['iterations']):
+                if not options['warm_cache']:
+                    cache.clear()
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = request()
+                    timings.append(time.perf_counter() - started)
+                if response.status_code >= 400:
+                    raise RuntimeError(
+                        f'{name}: ответ {response.status_code}')
+                queries = len(captured)
+            results[name] = {
+                'iterations': len(timings),
+                'mean_ms': statistics.mean(timings) * 1000,
+                'p50_ms': percentile(timings, 0.5) * 1000,
+                'p95_ms': percentile(timings, 0.95) * 1000,
+                'max_ms': max(timings) * 1000,
+                'rps': len(timings) / sum(timings),
+                'queries': queries,
+            }
+        return results
+
+    def compare_templates(self, options):
+        """
+        Время рендеринга шаблонов страниц для каждого профиля загрузки:
+        без кеша шаблоны ищутся и компилируются в каждом запросе.
+        """
+        results = {}
+        for profile, cached in TEMPLATE_PROFILES:
+            templates = deepcopy(settings.TEMPLATES)
+            templates[0]['OPTIONS']['loaders'] = template_loaders(cached)
+            with override_settings(TEMPLATES=templates,
+                                   METRICS_SAMPLE_RATE=1):
+                if cached:
+                    warm_templates()
+                for name, request in self.scenarios(
+                        read_only=options['existing_db']).items():
+                    if name == 'add_comment':
+                        continue
+                    request()
+                    timings = []
+                    for _ in range(options['iterations']):
+                        if not options['warm_cache']:
+                            cache.clear()
+                        timings.append(render_ms(request()))
+                    results.setdefault(name, {})[profile] = {
+                        'mean_ms': statistics.mean(timings),
+                        'p50_ms': percentile(timings, 0.5),
+                    }
+        return results
@@ -0,0 +1,25 @@
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+
+from yatube.caches import cache_usage
+
+
+class Command(BaseCommand):
+    help = 'Показывает, сколько ключей и байт занимает в кеше каждый префикс.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cache', default='default')
+
+    def handle(self, *args, **options):
+        try:
+            usage = cache_usage(caches[options['cache']])
+        except NotImplementedError as error:
+            raise CommandError(str(error))
+        total_keys = total_bytes = 0
+        for prefix, (keys, size) in sorted(
+                usage.items(), key=lambda item: -item[1][1]):
+            self.stdout.write(f'{prefix:40} {keys:8} {size / 1024:10.1f} KiB')
+            total_keys += keys
+            total_bytes += size
+        self.stdout.write(self.style.SUCCESS(
+            f'{"всего":40} {total_keys:8} {total_bytes / 1024:10.1f} KiB'))
@@ -0,0 +1,35 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.transfer import MODELS, export_records, write_csv, write_ndjson
+
+
+class Command(BaseCommand):
+    help = ('Выгружает пользователей, группы, посты, комментарии и подписки '
+            'в NDJSON (один файл) или CSV (каталог с файлом на модель). '
+            'Строки читаются из базы пачками, память не растёт с объёмом.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('output',
+                            help='Файл NDJSON, «-» для stdout, или каталог '
+                                 'для CSV.')
+        parser.add_argument('--format', choices=('ndjson', 'csv'),
+                            default='ndjson')
+        parser.add_argument('--models', nargs='+', choices=MODELS,
+                            default=MODELS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        records = export_records(options['models'], options['batch_size'])
+        output = options['output']
+        if options['format'] == 'csv':
+            if output == '-':
+                raise CommandError('CSV пишется только в каталог.')
+            total = write_csv(records, output)
+        elif output == '-':
+            total = write_ndjson(records, sys.stdout)
+        else:
+            with open(output, 'w', encoding='utf-8') as stream:
+                total = write_ndjson(records, stream)
+        self.stderr.write(f'Выгружено записей: {total}')
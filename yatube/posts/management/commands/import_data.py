@@ -0,0 +1,99 @@
+import json
+import os
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from posts.bulk import preserve_dates, refresh_derived
+from posts.models import Comment, Group, Post, User
+from posts.transfer import (TransferError, batches, build, read_csv,
+                            read_ndjson)
+
+
+def load_checkpoint(path, source):
+    """Сколько записей источника уже импортировано прошлым запуском."""
+    if not os.path.exists(path):
+        return 0
+    with open(path) as checkpoint:
+        state = json.load(checkpoint)
+    if state.get('source') != source:
+        raise CommandError(
+            f'Контрольная точка {path} относится к {state.get("source")}.')
+    return state['done']
+
+
+def save_checkpoint(path, source, done):
+    # os.replace атомарен: прерванная запись не испортит прошлую точку
+    with open(f'{path}.tmp', 'w') as checkpoint:
+        json.dump({'source': source, 'done': done}, checkpoint)
+    os.replace(f'{path}.tmp', path)
+
+
+class Command(BaseCommand):
+    help = ('Загружает данные, выгруженные export_data: bulk_create пачками, '
+            'каждая в своей транзакции. После каждой пачки пишется '
+            'контрольная точка, и прерванный импорт продолжается с неё. '
+            'Счётчики, ленты подписок, поисковый индекс и кеш, которые '
+            'обычно обновляют сигналы, пересчитываются один раз в конце.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('source',
+                            help='Файл NDJSON или каталог с CSV.')
+        parser.add_argument('--format', choices=('auto', 'ndjson', 'csv'),
+                            default='auto')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--checkpoint',
+                            help='Файл контрольной точки; по умолчанию '
+                                 '<source>.checkpoint.')
+        parser.add_argument('--no-refresh', action='store_true',
+                            help='Не пересчитывать производные данные: '
+                                 'например, если дальше будет ещё импорт.')
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        format_ = options['format']
+        if format_ == 'auto':
+            format_ = 'csv' if os.path.isdir(source) else 'ndjson'
+        checkpoint = options['checkpoint'] or (
+            source.rstrip(os.sep) + '.checkpoint')
+        done = load_checkpoint(checkpoint, source)
+        records = read_csv(source) if format_ == 'csv' else read_ndjson(
+            source)
+        imported = 0  # без уже загруженных прошлым запуском
+        try:
+            with preserve_dates(Post, Comment):
+                for model, batch in batches(islice(records, done, None),
+                                            options['batch_size']):
+                    with transaction.atomic():
+                        # build пропускает записи, уже загруженные, если
+                        # процесс упал между коммитом и точкой, так что
+                        # objects — ровно те строки, что попадут в базу
+                        model_class, objects = build(model, batch)
+                        model_class.objects.bulk_create(objects)
+                    done += len(batch)
+                    imported += len(objects)
+                    save_checkpoint(checkpoint, source, done)
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'{model}: {done}')
+        except (OSError, TransferError) as error:
+            raise CommandError(
+                f'Импорт остановлен после записи {done}: {error}. '
+                'Повторный запуск продолжит с этого места.')
+        self.reset_sequences()
+        if not options['no_refresh']:
+            with transaction.atomic():
+                refresh_derived(options['batch_size'])
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано записей: {imported}, всего в источнике: {done}'))
+
+    def reset_sequences(self):
+        # посты и комментарии вставлялись с явными id
+        statements = connection.ops.sequence_reset_sql(
+            no_style(), [User, Group, Post, Comment])
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
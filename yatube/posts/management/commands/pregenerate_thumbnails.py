@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+from posts.cache import post_scopes
+from posts.models import Post, Profile
+
+
+class Command(BaseCommand):
+    help = ('Создаёт миниатюры и адаптивные варианты для уже загруженных '
+            'изображений постов и фотографий профилей.')
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').exclude(
+            image__isnull=True).only('image', 'author_id', 'group_id')
+        profiles = Profile.objects.exclude(photo='').only('photo', 'user_id')
+        files = [(post.image, thumbnails.POST_THUMBNAILS, True,
+                  post_scopes(post.pk, post.author_id, post.group_id))
+                 for post in posts.iterator()]
+        files += [(profile.photo, thumbnails.PHOTO_THUMBNAILS, False,
+                   [f'profile:{profile.user_id}'])
+                  for profile in profiles.iterator()]
+        thumbnails.pregenerate(files)
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано изображений: {len(files)}'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from posts.counters import rebuild_comment_counters, rebuild_counters
+
+
+class Command(BaseCommand):
+    help = ('Пересчитывает счётчики записей, подписчиков и подписок '
+            'в профилях, число и время последнего комментария в постах, '
+            'например после импорта данных.')
+
+    def handle(self, *args, **options):
+        changed = rebuild_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено профилей: {changed}'))
+        changed = rebuild_comment_counters()
+        self.stdout.write(self.style.SUCCESS(
+            f'Исправлено постов: {changed}'))
@@ -0,0 +1,132 @@
+import random
+from datetime import timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from posts.bulk import bulk_insert, preserve_dates, refresh_derived
+from posts.models import Comment, Follow, Group, Post, User
+
+WORDS = ('кот', 'собака', 'город', 'море', 'книга', 'кофе', 'утро', 'дождь',
+         'поезд', 'музыка', 'горы', 'лес', 'работа', 'друзья', 'лето',
+         'python', 'django', 'код', 'тест', 'релиз')
+
+
+def last_pk(model):
+    return model.objects.order_by('-pk').values_list(
+        'pk', flat=True).first() or 0
+
+
+def power_law_weights(count, alpha):
+    """Веса Ципфа: k-й по популярности получает вес 1 / k ** alpha."""
+    return [1 / (rank + 1) ** alpha for rank in range(count)]
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими пользователями, группами, '
+            'постами, комментариями и подписками со степенным '
+            'распределением популярности авторов.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Среднее число подписок пользователя.')
+        parser.add_argument('--alpha', type=float, default=1.1,
+                            help='Показатель степенного закона.')
+        parser.add_argument('--days', type=int, default=365,
+                            help='За сколько дней раскидать посты.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        with transaction.atomic(), preserve_dates(Post, Comment):
+            users = self.create_users(options['users'], batch_size)
+            last = last_pk(Group)
+            bulk_insert(Group, (
+                Group(title=f'Группа {last + number}',
+                      slug=f'group-{last + number}',
+                      description='Синтетическая группа')
+                for number in range(options['groups'])), batch_size)
+            groups = list(Group.objects.filter(pk__gt=last))
+            # популярные авторы и пишут больше, и читают их чаще
+            authors = users[:]
+            rng.shuffle(authors)
+            weights = power_law_weights(len(authors), options['alpha'])
+            posts = self.create_posts(rng, authors, weights, groups,
+                                      options, batch_size)
+            self.create_comments(rng, users, posts, options['comments'],
+                                 batch_size)
+            follows = self.create_follows(rng, users, authors, weights,
+                                          options['follows'], batch_size)
+            refresh_derived(batch_size)
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано: пользователей {len(users)}, групп {len(groups)}, '
+            f'постов {len(posts)}, комментариев {options["comments"]}, '
+            f'подписок {follows}'))
+
+    def create_users(self, count, batch_size):
+        password = make_password(None)
+        last = last_pk(User)
+        bulk_insert(User, (
+            User(username=f'seed_user_{last + number}', password=password)
+            for number in range(count)), batch_size)
+        # SQLite не возвращает id из bulk_create, поэтому перечитываем
+        return list(User.objects.filter(pk__gt=last).values_list(
+            'pk', flat=True))
+
+    def create_posts(self, rng, authors, weights, groups, options,
+                     batch_size):
+        now = timezone.now()
+        span = timedelta(days=options['days']).total_seconds()
+        last = last_pk(Post)
+
+        def posts():
+            for author_id in rng.choices(authors, weights,
+                                         k=options['posts']):
+                pub_date = now - timedelta(seconds=rng.random() * span)
+                group = (rng.choice(groups) if groups and rng.random() < 0.5
+                         else None)
+                yield Post(author_id=author_id, group=group,
+                           pub_date=pub_date, updated=pub_date,
+                           text=' '.join(rng.choices(
+                               WORDS, k=rng.randint(5, 40))))
+        bulk_insert(Post, posts(), batch_size)
+        return list(Post.objects.filter(pk__gt=last).order_by(
+            '-pub_date').values_list('pk', 'pub_date'))
+
+    def create_comments(self, rng, users, posts, count, batch_size):
+        if not posts:
+            return
+        now = timezone.now()
+        # обсуждают в основном свежие посты
+        weights = power_law_weights(len(posts), 0.8)
+
+        def comments():
+            for post_id, pub_date in rng.choices(posts, weights, k=count):
+                created = min(now, pub_date + timedelta(
+                    seconds=rng.randint(1, 3 * 24 * 3600)))
+                yield Comment(post_id=post_id, author_id=rng.choice(users),
+                              created=created,
+                              text=' '.join(rng.choices(WORDS, k=8)))
+        bulk_insert(Comment, comments(), batch_size)
+
+    def create_follows(self, rng, users, authors, weights, average,
+                       batch_size):
+        def follows():
+            for user in users:
+                # число подписок тоже с тяжёлым хвостом
+                count = min(int(rng.expovariate(1 / average)) + 1,
+                            len(authors))
+                chosen = set(rng.choices(authors, weights, k=count))
+                chosen.discard(user)
+                for author_id in chosen:
+                    yield Follow(user_id=user, author_id=author_id)
+        return bulk_insert(Follow, follows(), batch_size,
+                           ignore_conflicts=True)
@@ -0,0 +1,67 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:25
+
+from django.db import migrations, models
+from PIL import Image
+
+
+def read_metadata(file_):
+    try:
+        with file_.open('rb'):
+            width, height = Image.open(file_).size
+        return width, height, file_.size
+    except (OSError, SyntaxError, Image.DecompressionBombError):
+        return None, None, None
+
+
+def fill_metadata(apps, schema_editor):
+    """Разово читает размеры уже загруженных изображений."""
+    for model_name, field in (('Post', 'image'), ('Profile', 'photo')):
+        model = apps.get_model('posts', model_name)
+        rows = model.objects.exclude(**{field: ''}).exclude(
+            **{f'{field}__isnull': True})
+        for row in rows.iterator():
+            width, height, size = read_metadata(getattr(row, field))
+            model.objects.filter(pk=row.pk).update(**{
+                f'{field}_width': width, f'{field}_height': height,
+                f'{field}_size': size})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_feed_entry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='image_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_size',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='profile',
+            name='photo_width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_metadata, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 2.2.28 on 2026-10-18 11:26
+
+import re
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.utils import OperationalError
+import django.db.models.deletion
+
+
+def create_index(apps, schema_editor):
+    """
+    На SQLite с FTS5 создаёт и заполняет таблицу posts_search,
+    иначе заполняет обратный индекс SearchTerm.
+    """
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE posts_search USING fts5("
+                "text, group_title, tokenize='unicode61 remove_diacritics 2')")
+        except OperationalError:
+            pass
+        else:
+            schema_editor.execute(
+                "INSERT INTO posts_search (rowid, text, group_title) "
+                "SELECT p.id, p.text, COALESCE(g.title, '') "
+                "FROM posts_post p LEFT JOIN posts_group g "
+                "ON g.id = p.group_id")
+            return
+    Post = apps.get_model('posts', 'Post')
+    SearchTerm = apps.get_model('posts', 'SearchTerm')
+    for post in Post.objects.select_related('group').iterator():
+        text = post.text + ' ' + (post.group.title if post.group else '')
+        terms = Counter(token.casefold()[:64]
+                        for token in re.findall(r'\w+', text))
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post=post, count=count)
+            for term, count in terms.items())
+
+
+def drop_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS posts_search')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_image_metadata'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+                ('count', models.PositiveIntegerField(default=1)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='posts.Post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='searchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'post'), name='unique_search_term'),
+        ),
+        migrations.RunPython(create_index, drop_index),
+    ]
@@ -1,6 +1,6 @@
 from django.contrib.auth import get_user_model
-from django.db import models
 from django.conf import settings
+from django.db import models
 
 User = get_user_model()
 
@@ -10,6 +10,15 @@ class Profile(models.Model):
                                 on_delete=models.CASCADE)
     date_of_birth = models.DateField(blank=True, null=True)
     photo = models.ImageField(upload_to='users/%Y/%m/%d', blank=True)
+    # размеры и вес фото после нормализации при загрузке
+    photo_width = models.PositiveIntegerField(blank=True, null=True)
+    photo_height = models.PositiveIntegerField(blank=True, null=True)
+    photo_size = models.PositiveIntegerField(blank=True, null=True)
+    posts_count = models.PositiveIntegerField('записей', default=0)
+    followers_count = models.PositiveIntegerField('подписчиков', default=0)
+    following_count = models.PositiveIntegerField('подписок', default=0)
+    # лента подписчиков собирается при чтении, а не рассылкой при записи
+    feed_pull = models.BooleanField(default=False)
 
     def __str__(self):
         return 'Profile for use {}'.format(self.user.username)
@@ -27,21 +36,56 @@ class Group(models.Model):
         return self.title
 
 
+# «Обсуждаемые»: по числу комментариев, индекс post_discussed
+DISCUSSED_ORDERING = ('-comment_count', '-pub_date', '-pk')
+
+
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        """
+        Посты для ленты: автор и группа одним запросом, число
+        комментариев хранится в самом посте.
+        """
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField('')
     pub_date = models.DateTimeField('date published', auto_now_add=True,
                                     db_index=True)
+    updated = models.DateTimeField('date updated', auto_now=True)
+    # одиночные индексы внешних ключей заменены составными в Meta
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='posts')
+                               related_name='posts', db_index=False)
     group = models.ForeignKey(Group, on_delete=models.SET_NULL,
-                              related_name='posts',
+                              related_name='posts', db_index=False,
                               blank=True, null=True)
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    # размеры и вес изображения после нормализации при загрузке
+    image_width = models.PositiveIntegerField(blank=True, null=True)
+    image_height = models.PositiveIntegerField(blank=True, null=True)
+    image_size = models.PositiveIntegerField(blank=True, null=True)
+    # ведутся posts.counters при добавлении и удалении комментариев
+    comment_count = models.PositiveIntegerField('комментариев', default=0,
+                                                editable=False)
+    last_comment_at = models.DateTimeField('последний комментарий',
+                                           blank=True, null=True,
+                                           editable=False)
+
+    objects = PostQuerySet.as_manager()
 
     class Meta:
         ordering = ['-pub_date']
         verbose_name_plural = 'Посты'
         verbose_name = 'Пост'
+        indexes = [
+            models.Index(fields=('group', '-pub_date', '-id'),
+                         name='post_group_date'),
+            models.Index(fields=('author', '-pub_date', '-id'),
+                         name='post_author_date'),
+            models.Index(fields=('-comment_count', '-pub_date', '-id'),
+                         name='post_discussed'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -49,7 +93,7 @@ class Post(models.Model):
 
 class Comment(models.Model):
     post = models.ForeignKey(Post, on_delete=models.CASCADE,
-                             related_name='post_comments')
+                             related_name='post_comments', db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                verbose_name='Автор',
                                related_name='author_comment')
@@ -58,16 +102,63 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=('post', '-created', '-id'),
+                         name='comment_post_created'),
+        ]
 
 
 class Follow(models.Model):
+    # по user ищет уникальный индекс (user, author),
+    # по author — индекс (author, user)
     user = models.ForeignKey(
-        User, on_delete=models.CASCADE, related_name='follower')
+        User, on_delete=models.CASCADE, related_name='follower',
+        db_index=False)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
-                               related_name='following')
+                               related_name='following', db_index=False)
 
     class Meta:
         constraints = [
             models.UniqueConstraint(fields=('user', 'author'),
                                     name='unique_list')
         ]
+        indexes = [
+            models.Index(fields=('author', 'user'),
+                         name='follow_author_user'),
+        ]
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(User, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='feed_entries')
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('user', 'post'),
+                                    name='unique_feed_entry')
+        ]
+        indexes = [
+            models.Index(fields=('user', '-pub_date', '-post'),
+                         name='feed_entry_user_date'),
+        ]
+
+
+class SearchTerm(models.Model):
+    """
+    Запись обратного индекса для поиска без FTS5: слово из текста
+    поста или названия его группы и число его вхождений.
+    """
+    term = models.CharField(max_length=64)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='search_terms')
+    count = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=('term', 'post'),
+                                    name='unique_search_term')
+        ]
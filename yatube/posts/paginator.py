@@ -0,0 +1,261 @@
+import base64
+import binascii
+import heapq
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+NEXT = 'next'
+PREVIOUS = 'prev'
+
+
+def _count(object_list):
+    """
+    COUNT без аннотаций: подзапросы в них не нужны для подсчёта
+    и не должны выполняться для каждой строки.
+    """
+    if isinstance(object_list, QuerySet):
+        object_list = object_list.values('pk')
+    return object_list.count()
+
+
+class KeysetPaginator(Paginator):
+    """
+    Паджинатор по ключу (pub_date, id) вместо OFFSET.
+
+    Ссылки «вперёд/назад» несут курсор с ключом крайней записи страницы,
+    поэтому выборка любой страницы — это поиск по индексу и LIMIT.
+    Переход по ?page=N по-прежнему работает через OFFSET.
+    В режиме approximate количество записей считается только на
+    lookahead страниц после текущей, с одной лишней записью, чтобы
+    знать, есть ли страницы дальше.
+    """
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 approximate=None, lookahead=None, **kwargs):
+        super().__init__(object_list.order_by(*ordering), per_page, **kwargs)
+        self.ordering = tuple(ordering)
+        if approximate is None:
+            approximate = settings.PAGINATOR_APPROXIMATE_COUNT
+        self.approximate = approximate
+        self.lookahead = lookahead or settings.PAGINATOR_LOOKAHEAD_PAGES
+        self.count_is_exact = not approximate
+        self._offset = 0
+        self._tail = None
+
+    @cached_property
+    def count(self):
+        if not self.approximate:
+            return _count(self.object_list)
+        # строки считаются от начала текущей страницы, включая её саму
+        limit = (self.lookahead + 1) * self.per_page + 1
+        if self._tail is None:
+            tail = self.object_list[self._offset:self._offset + limit]
+        else:
+            tail = self._tail[:limit]
+        ahead = _count(tail)
+        if not ahead and self._offset:
+            # номер страницы за концом ленты: как и при точном подсчёте,
+            # get_page вернёт последнюю настоящую страницу
+            self.count_is_exact = True
+            return _count(self.object_list)
+        self.count_is_exact = ahead < limit
+        return self._offset + ahead
+
+    def get_page(self, number, cursor=None):
+        if cursor:
+            try:
+                return self.page_from_cursor(cursor)
+            except InvalidPage:
+                pass
+        try:
+            self._offset = (max(int(number), 1) - 1) * self.per_page
+        except (TypeError, ValueError):
+            self._offset = 0
+        return self._with_cursors(super().get_page(number))
+
+    def page_from_cursor(self, cursor):
+        number, direction, values = self.decode_cursor(cursor)
+        if direction == PREVIOUS:
+            rows = list(self._seek(values, reverse=True)[:self.per_page])
+            rows.reverse()
+            if len(rows) < self.per_page or number <= 1:
+                return self.get_page(1)
+            self._offset = (number - 1) * self.per_page
+            self._tail = self._seek(rows[0], inclusive=True, raw=False)
+        else:
+            self._offset = (number - 1) * self.per_page
+            self._tail = self._seek(values)
+            rows = list(self._tail[:self.per_page])
+            if not rows:
+                raise InvalidPage('Курсор указывает за конец ленты')
+        if not self.approximate and number > self.num_pages:
+            number = self.num_pages
+        return self._with_cursors(self._get_page(rows, number, self))
+
+    def encode_cursor(self, number, direction, obj):
+        payload = json.dumps([number, direction, self._key(obj)], default=str)
+        token = base64.urlsafe_b64encode(payload.encode())
+        return token.decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            number, direction, values = json.loads(
+                base64.urlsafe_b64decode(padded.encode()).decode())
+            number = int(number)
+            values = [self._to_python(name, value) for name, value
+                      in zip(self._names, values)]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError,
+                ValidationError):
+            raise InvalidPage('Неверный курсор')
+        if direction not in (NEXT, PREVIOUS) or len(values) != len(
+                self._names) or number < 1:
+            raise InvalidPage('Неверный курсор')
+        return number, direction, values
+
+    @cached_property
+    def _names(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _key(self, obj):
+        return [getattr(obj, name) for name in self._names]
+
+    def _to_python(self, name, value):
+        # NULL в ключе ленты не бывает, а в фильтре он даёт ValueError
+        if value is None or isinstance(value, (bool, list, dict)):
+            raise InvalidPage('Неверный курсор')
+        opts = self.object_list.model._meta
+        try:
+            field = opts.pk if name == 'pk' else opts.get_field(name)
+        except FieldDoesNotExist:
+            return value
+        value = field.to_python(value)
+        if value is None:
+            raise InvalidPage('Неверный курсор')
+        return value
+
+    def _seek(self, values, reverse=False, inclusive=False, raw=True):
+        """Записи строго после ключа values в порядке ленты."""
+        if not raw:
+            values = self._key(values)
+        condition = Q()
+        for index, field in enumerate(self.ordering):
+            descending = field.startswith('-') != reverse
+            lookup = '{}__{}'.format(self._names[index],
+                                     'lt' if descending else 'gt')
+            term = Q(**{lookup: values[index]})
+            for name, value in zip(self._names[:index], values[:index]):
+                term &= Q(**{name: value})
+            condition |= term
+        if inclusive:
+            condition |= Q(**dict(zip(self._names, values)))
+        queryset = self.object_list.reverse() if reverse else self.object_list
+        return queryset.filter(condition)
+
+    def _with_cursors(self, page):
+        page.next_cursor = page.previous_cursor = None
+        rows = page.object_list
+        if rows and page.has_next():
+            page.next_cursor = self.encode_cursor(
+                page.number + 1, NEXT, rows[len(rows) - 1])
+        if rows and page.has_previous():
+            page.previous_cursor = self.encode_cursor(
+                page.number - 1, PREVIOUS, rows[0])
+        page.window = self._window(page.number)
+        return page
+
+    def _window(self, number, on_each_side=3):
+        first = max(number - on_each_side, 1)
+        last = min(number + on_each_side, self.num_pages)
+        return range(first, last + 1)
+
+
+def paginate(request, object_list, **kwargs):
+    """Страница ленты по ?cursor= или ?page= из запроса."""
+    paginator = KeysetPaginator(object_list, settings.PAGINATOR_COUNT,
+                                **kwargs)
+    return paginator.get_page(request.GET.get('page'),
+                              cursor=request.GET.get('cursor'))
+
+
+class MergedFeed:
+    """
+    Несколько querysets с одинаковой сортировкой как одна лента.
+    Для KeysetPaginator ведёт себя как queryset: поддерживает order_by,
+    filter, reverse, срезы и count, а записи сливает уже в Python.
+    """
+    ordered = True
+
+    def __init__(self, *querysets, ordering=(), low=0, high=None):
+        self.querysets = querysets
+        self.model = querysets[0].model
+        self.ordering = tuple(ordering)
+        self.low = low
+        self.high = high
+        self._result = None
+
+    def _clone(self, querysets=None, **kwargs):
+        options = {'ordering': self.ordering, 'low': self.low,
+                   'high': self.high}
+        options.update(kwargs)
+        return MergedFeed(*(querysets or self.querysets), **options)
+
+    def order_by(self, *ordering):
+        return self._clone([qs.order_by(*ordering) for qs in self.querysets],
+                           ordering=ordering)
+
+    def reverse(self):
+        ordering = tuple(name[1:] if name.startswith('-') else f'-{name}'
+                         for name in self.ordering)
+        return self._clone([qs.reverse() for qs in self.querysets],
+                           ordering=ordering)
+
+    def filter(self, *args, **kwargs):
+        return self._clone([qs.filter(*args, **kwargs)
+                            for qs in self.querysets])
+
+    def count(self):
+        if self.high is None:
+            total = sum(_count(qs) for qs in self.querysets)
+        else:
+            total = min(sum(_count(qs[:self.high])
+                            for qs in self.querysets), self.high)
+        return max(total - self.low, 0)
+
+    def __getitem__(self, item):
+        if isinstance(item, slice):
+            low = self.low + (item.start or 0)
+            high = self.high
+            if item.stop is not None:
+                stop = self.low + item.stop
+                high = stop if high is None else min(high, stop)
+            return self._clone(low=low, high=high)
+        return self._fetch()[item]
+
+    def _fetch(self):
+        if self._result is None:
+            names = [name.lstrip('-') for name in self.ordering]
+            descending = bool(self.ordering) and self.ordering[0].startswith(
+                '-')
+            streams = [qs if self.high is None else qs[:self.high]
+                       for qs in self.querysets]
+            merged = heapq.merge(
+                *streams, reverse=descending,
+                key=lambda obj: [getattr(obj, name) for name in names])
+            self._result = list(islice(merged, self.low, self.high))
+        return self._result
+
+    def __iter__(self):
+        return iter(self._fetch())
+
+    def __len__(self):
+        return len(self._fetch())
+
+    def __bool__(self):
+        return bool(self._fetch())
@@ -0,0 +1,199 @@
+import math
+import re
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connection
+
+from .models import Post, SearchTerm
+
+FTS_TABLE = 'posts_search'
+MAX_TERM_LENGTH = 64
+TOKEN = re.compile(r'\w+')
+
+_fts_tables = {}
+
+
+def tokenize(text):
+    return [token.casefold()[:MAX_TERM_LENGTH]
+            for token in TOKEN.findall(text or '')]
+
+
+def parse(query):
+    """Слова запроса без повторов, не больше SEARCH_MAX_TERMS."""
+    terms = list(dict.fromkeys(tokenize(query)))
+    return terms[:settings.SEARCH_MAX_TERMS]
+
+
+def use_fts():
+    """
+    FTS5 используется на SQLite, если миграция смогла создать таблицу
+    posts_search; иначе работает обратный индекс SearchTerm.
+    """
+    if settings.SEARCH_BACKEND != 'auto':
+        return settings.SEARCH_BACKEND == 'fts5'
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts_tables:
+        _fts_tables[name] = (
+            FTS_TABLE in connection.introspection.table_names())
+    return _fts_tables[name]
+
+
+def _group_title(post):
+    return post.group.title if post.group_id else ''
+
+
+def index_post(post):
+    """Переиндексирует пост: удаляет старую запись и вставляет новую."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post.pk])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, group_title) '
+                f'VALUES (%s, %s, %s)',
+                [post.pk, post.text, _group_title(post)])
+        return
+    terms = Counter(tokenize(post.text) + tokenize(_group_title(post)))
+    SearchTerm.objects.filter(post=post).delete()
+    SearchTerm.objects.bulk_create(
+        SearchTerm(term=term, post=post, count=count)
+        for term, count in terms.items())
+
+
+def remove_post(post_id):
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s',
+                           [post_id])
+    else:
+        SearchTerm.objects.filter(post_id=post_id).delete()
+
+
+def index_group(group):
+    """Название группы входит в документ каждого её поста."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'UPDATE {FTS_TABLE} SET group_title = %s WHERE rowid IN '
+                f'(SELECT id FROM posts_post WHERE group_id = %s)',
+                [group.title, group.pk])
+        return
+    for post in group.posts.select_related('group').iterator():
+        index_post(post)
+
+
+def rebuild():
+    """Строит индекс заново по всем постам. Возвращает их число."""
+    if use_fts():
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, text, group_title) '
+                f'SELECT p.id, p.text, COALESCE(g.title, \'\') '
+                f'FROM posts_post p LEFT JOIN posts_group g '
+                f'ON g.id = p.group_id')
+        return Post.objects.count()
+    SearchTerm.objects.all().delete()
+    total = 0
+    for post in Post.objects.select_related('group').iterator():
+        terms = Counter(tokenize(post.text) + tokenize(_group_title(post)))
+        SearchTerm.objects.bulk_create(
+            SearchTerm(term=term, post=post, count=count)
+            for term, count in terms.items())
+        total += 1
+    return total
+
+
+class SearchResults:
+    """
+    Результаты поиска как последовательность для Paginator: count()
+    и срезы, которые выбирают из базы только посты нужной страницы.
+
+    Каждое слово запроса ищется как префикс, документ должен содержать
+    все слова. FTS5 ранжирует по bm25 (название группы весит вдвое
+    больше текста), обратный индекс — по сумме tf-idf.
+    """
+    ordered = True
+
+    def __init__(self, query):
+        self.terms = parse(query)
+        self._ranking = None
+
+    def count(self):
+        if not self.terms:
+            return 0
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT COUNT(*) FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s', [self._match()])
+                return cursor.fetchone()[0]
+        return len(self._python_ranking())
+
+    def __len__(self):
+        return self.count()
+
+    def ids(self, offset, limit):
+        """id постов с offset по offset + limit в порядке релевантности."""
+        if not self.terms:
+            return []
+        if use_fts():
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    f'SELECT rowid FROM {FTS_TABLE} '
+                    f'WHERE {FTS_TABLE} MATCH %s '
+                    f'ORDER BY bm25({FTS_TABLE}, 1.0, 2.0), rowid DESC '
+                    f'LIMIT %s OFFSET %s',
+                    [self._match(), limit, offset])
+                return [row[0] for row in cursor.fetchall()]
+        return self._python_ranking()[offset:offset + limit]
+
+    def __getitem__(self, item):
+        if not isinstance(item, slice):
+            return self[item:item + 1][0]
+        start = item.start or 0
+        ids = self.ids(start, item.stop - start)
+        posts = Post.objects.feed().in_bulk(ids)
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def _match(self):
+        return ' '.join(f'"{term}"*' for term in self.terms)
+
+    def _python_ranking(self):
+        if self._ranking is None:
+            total = Post.objects.count() or 1
+            scores = None
+            for term in self.terms:
+                postings = defaultdict(int)
+                rows = SearchTerm.objects.filter(
+                    term__gte=term, term__lt=term + '\U0010ffff'
+                ).values_list('post_id', 'count')
+                for post_id, count in rows.iterator():
+                    postings[post_id] += count
+                idf = math.log(1 + total / (len(postings) or 1))
+                if scores is None:
+                    scores = {post_id: count * idf
+                              for post_id, count in postings.items()}
+                else:
+                    scores = {post_id: score + postings[post_id] * idf
+                              for post_id, score in scores.items()
+                              if post_id in postings}
+            self._ranking = sorted(
+                scores or {}, key=lambda post_id: (-scores[post_id],
+                                                   -post_id))
+        return self._ranking
+
+
+class SearchPaginator(Paginator):
+    count_is_exact = True
+
+
+def search(query, page, per_page=None):
+    """Страница ранжированных результатов поиска."""
+    paginator = SearchPaginator(SearchResults(query),
+                                per_page or settings.PAGINATOR_COUNT)
+    return paginator.get_page(page)
@@ -0,0 +1,170 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from . import cache, cards, counters, search, thumbnails, timeline
+from .models import Comment, Follow, Group, Post, Profile, User
+
+
+@receiver(post_save, sender=User)
+def create_profile(sender, instance, created, raw=False, **kwargs):
+    """Профиль со счётчиками заводится вместе с пользователем."""
+    if created and not raw:
+        Profile.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Profile)
+def count_new_profile(sender, instance, created, **kwargs):
+    if created:
+        transaction.on_commit(lambda: cache.change_user_count(1))
+
+
+@receiver(post_delete, sender=Profile)
+def count_deleted_profile(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.change_user_count(-1))
+
+
+def bump_after_commit(*scopes):
+    transaction.on_commit(lambda: cache.bump(*scopes))
+
+
+def _loaded(instance, field):
+    """
+    Загруженное значение поля или None для отложенного: обращение к
+    отложенному полю перечитывает объект и снова вызывает post_init.
+    """
+    value = instance.__dict__.get(field)
+    return getattr(value, 'name', value)
+
+
+@receiver(post_init, sender=Post)
+def remember_group(sender, instance, **kwargs):
+    instance._loaded_group_id = _loaded(instance, 'group_id')
+    instance._loaded_image = _loaded(instance, 'image')
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post(sender, instance, **kwargs):
+    scopes = cache.post_scopes(instance.pk, instance.author_id,
+                               instance.group_id)
+    if instance._loaded_group_id not in (None, instance.group_id):
+        scopes.append(f'group:{instance._loaded_group_id}')
+    instance._loaded_group_id = instance.group_id
+    bump_after_commit(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment(sender, instance, **kwargs):
+    if Comment.post.is_cached(instance):
+        post = instance.post
+        author_id, group_id = post.author_id, post.group_id
+    else:
+        author_id, group_id = Post.objects.filter(
+            pk=instance.post_id).values_list('author_id', 'group_id').first(
+        ) or (None, None)
+    if author_id is None:
+        # пост удаляется вместе с комментариями и сбросит кеш сам
+        return
+    bump_after_commit(*cache.post_scopes(instance.post_id, author_id,
+                                         group_id))
+
+
+@receiver(post_delete, sender=Comment)
+def discount_comment(sender, instance, **kwargs):
+    counters.discount_comment(instance)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_save, sender=Profile)
+def bump_profile(sender, instance, update_fields=None, raw=False,
+                 **kwargs):
+    """Имя, фото и дата рождения автора видны в его карточках и профиле."""
+    if raw or update_fields == frozenset({'last_login'}):
+        # вход пользователя ничего на страницах не меняет
+        return
+    user_id = instance.pk if sender is User else instance.user_id
+    bump_after_commit(f'profile:{user_id}', 'index')
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def bump_group(sender, instance, **kwargs):
+    bump_after_commit('index', f'group:{instance.pk}', cards.GROUPS_SCOPE)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow(sender, instance, **kwargs):
+    # у автора меняется число подписчиков в карточке профиля
+    bump_after_commit(f'follow:{instance.user_id}',
+                      f'profile:{instance.author_id}')
+
+
+@receiver(post_save, sender=Follow)
+def backfill_feed(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_feed(sender, instance, **kwargs):
+    timeline.prune(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Post)
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        search.index_post(instance)
+
+
+@receiver(post_delete, sender=Post)
+def unindex_post(sender, instance, **kwargs):
+    search.remove_post(instance.pk)
+
+
+@receiver(post_save, sender=Group)
+def index_group(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        search.index_group(instance)
+
+
+@receiver(post_init, sender=Profile)
+def remember_photo(sender, instance, **kwargs):
+    instance._loaded_image = _loaded(instance, 'photo')
+
+
+def enqueue_thumbnails(instance, file_, sizes, variants=False, scopes=()):
+    """
+    Миниатюры нового файла заказываются после фиксации транзакции,
+    по готовности сбрасываются страницы, показавшие заглушку.
+    """
+    if file_.name and file_.name != instance._loaded_image:
+        instance._loaded_image = file_.name
+        transaction.on_commit(
+            lambda: thumbnails.enqueue(file_, sizes, variants, scopes))
+
+
+@receiver(post_save, sender=Post)
+def enqueue_post_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue_thumbnails(instance, instance.image,
+                           thumbnails.POST_THUMBNAILS, variants=True,
+                           scopes=cache.post_scopes(instance.pk,
+                                                    instance.author_id,
+                                                    instance.group_id))
+
+
+@receiver(post_save, sender=Profile)
+def enqueue_photo_thumbnails(sender, instance, raw=False, **kwargs):
+    if not raw:
+        enqueue_thumbnails(instance, instance.photo,
+                           thumbnails.PHOTO_THUMBNAILS,
+                           scopes=[f'profile:{instance.user_id}'])
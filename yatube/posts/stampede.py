@@ -0,0 +1,96 @@
+import math
+import random
+import threading
+import time
+from collections import Counter, namedtuple
+
+from django.conf import settings
+from django.core.cache import cache
+
+from yatube.metrics import record_cache
+from yatube.routers import replica_settled
+
+HIT = 'hit'
+MISS = 'miss'
+STALE = 'stale'
+
+Envelope = namedtuple('Envelope', 'value version expires delta')
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def record(event):
+    with _stats_lock:
+        _stats[event] += 1
+    record_cache(event)
+
+
+def cache_stats():
+    """Счётчики hit/miss/stale этого процесса."""
+    with _stats_lock:
+        return {event: _stats[event] for event in (HIT, MISS, STALE)}
+
+
+def lookup(key, version=None):
+    """
+    Значение и его состояние: HIT, STALE или MISS.
+
+    Запись устаревает по смене поколения, по истечении срока или
+    чуть раньше срока с вероятностью, растущей к его концу (XFetch):
+    так пересчёт начинает один процесс, пока остальные отдают кеш.
+    """
+    envelope = cache.get(key)
+    if envelope is None:
+        return None, MISS
+    if envelope.version != version:
+        return envelope.value, STALE
+    jitter = envelope.delta * settings.CACHE_EARLY_BETA * math.log(
+        random.random() or 1e-12)
+    if time.time() - jitter >= envelope.expires:
+        return envelope.value, STALE
+    return envelope.value, HIT
+
+
+def store(key, value, timeout, version=None, delta=0.0):
+    if isinstance(version, int) and not replica_settled(version / 10 ** 6):
+        # значение могли собрать с реплики, куда запись ещё не дошла
+        timeout = min(timeout, settings.DATABASE_REPLICA_LAG)
+    envelope = Envelope(value, version, time.time() + timeout, delta)
+    cache.set(key, envelope, timeout + settings.CACHE_STALE_TIMEOUT)
+
+
+def get_or_set(key, compute, timeout, version=None):
+    """
+    Замена cache.get_or_set с защитой от лавины пересчётов.
+
+    Пересчитывает значение только процесс, взявший короткую блокировку;
+    остальные отдают устаревшее значение, а если его нет — ждут, пока
+    блокировка не будет снята.
+    """
+    value, state = lookup(key, version)
+    if state == HIT:
+        record(HIT)
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.CACHE_LOCK_TIMEOUT):
+        try:
+            started = time.monotonic()
+            value = compute()
+            store(key, value, timeout, version, time.monotonic() - started)
+        finally:
+            cache.delete(lock_key)
+        record(MISS)
+        return value
+    if state == STALE:
+        record(STALE)
+        return value
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while time.monotonic() < deadline and cache.get(lock_key) is not None:
+        time.sleep(0.05)
+    value, state = lookup(key, version)
+    if state == MISS:
+        value = compute()
+        store(key, value, timeout, version)
+    record(state)
+    return value
@@ -0,0 +1,348 @@
+import os
+import tempfile
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import (Client, RequestFactory, SimpleTestCase, TestCase,
+                         TransactionTestCase, override_settings)
+from django.urls import reverse
+
+from yatube.caches import (COMPRESSED, RAW, CompactCache, cache_config,
+                           cache_usage, key_prefix)
+from yatube.context_processors import user_count
+
+from .. import stampede
+from ..cards import render_cards
+from ..cache import USER_COUNT_KEY, get_versions
+from ..models import Comment, Group, Post, User
+
+
+class UserCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.create_user(username='TestUser')
+
+    def setUp(self):
+        cache.clear()
+        self.request = RequestFactory().get('/')
+
+    def test_user_count_is_lazy(self):
+        """Контекст-процессор не обращается к базе и кешу без вывода............
+        """
+        with self.assertNumQueries(0):
+            context = user_count(self.request)
+        self.assertIsNone(cache.get(USER_COUNT_KEY))
+        with self.assertNumQueries(1):
+            self.assertEqual(str(context['user_count']), '1')
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                str(user_count(self.request)['user_count']), '1')
+
+
+class UserCountSignalsTest(TransactionTestCase):
+    def test_user_count_follows_profiles(self):
+        """Создание и удаление пользователей меняют закешированное число........
+        """
+        cache.clear()
+        request = RequestFactory().get('/')
+        self.assertEqual(str(user_count(request)['user_count']), '0')
+        user = User.objects.create_user(username='TestUser')
+        with self.assertNumQueries(0):
+            self.assertEqual(str(user_count(request)['user_count']), '1')
+        user.delete()
+        self.assertEqual(cache.get(USER_COUNT_KEY), 0)
+
+
+class FeedVersionTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.group = Group.objects.create(title='TestGroup', slug='test_slug')
+        self.client = Client()
+
+    def test_index_cache_is_reset_by_new_post(self):
+        """Новая запись сразу сбрасывает кеш главной страницы...................
+        """
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('index'))
+        self.assertIsNone(response.context)
+        Post.objects.create(author=self.user, text='test fresh text')
+        response = self.client.get(reverse('index'))
+        self.assertIsNotNone(response.context)
+        self.assertContains(response, 'test fresh text')
+
+    def test_scopes_bumped_by_changes(self):
+        """Изменения постов, комментариев и групп меняют только свои поколения..
+        """
+        post = Post.objects.create(author=self.user, text='test text')
+        scopes = ('index', f'post:{post.pk}', f'profile:{self.user.pk}',
+                  f'group:{self.group.pk}')
+        before = get_versions(*scopes)
+        Comment.objects.create(post=post, author=self.user, text='test')
+        after = get_versions(*scopes)
+        self.assertEqual(after[f'group:{self.group.pk}'],
+                         before[f'group:{self.group.pk}'])
+        self.assertGreater(after[f'post:{post.pk}'], before[f'post:{post.pk}'])
+        post.group = self.group
+        post.save()
+        self.assertGreater(get_versions(*scopes)[f'group:{self.group.pk}'],
+                           after[f'group:{self.group.pk}'])
+
+    def test_deferred_posts_load(self):
+        """Посты с отложенными полями загружаются и сбрасывают кеш при правке...
+        """
+        post = Post.objects.create(author=self.user, group=self.group,
+                                   text='test text')
+        self.assertEqual(len(Post.objects.only('text')), 1)
+        self.assertEqual(len(Post.objects.defer('group', 'image')), 1)
+        before = get_versions(f'post:{post.pk}')[f'post:{post.pk}']
+        deferred = Post.objects.only('text').get()
+        deferred.text = 'edited text'
+        deferred.save()
+        self.assertGreater(get_versions(f'post:{post.pk}')[f'post:{post.pk}'],
+                           before)
+
+
+class ProfileVersionTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser',
+                                             first_name='Old')
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def test_profile_edit_changes_pages(self):
+        """Правка профиля меняет ETag профиля и кеш главной.....................
+        """
+        url = reverse('profile', kwargs={'username': self.user.username})
+        etag = self.client.get(url)['ETag']
+        before = get_versions('index', f'profile:{self.user.pk}')
+        self.client.post(reverse('edit'), {'first_name': 'New',
+                                           'last_name': 'Name',
+                                           'email': 'new@example.com'})
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'New Name')
+        after = get_versions('index', f'profile:{self.user.pk}')
+        for scope, version in before.items():
+            self.assertGreater(after[scope], version)
+        self.client.logout()
+        self.client.force_login(self.user)
+        self.assertEqual(get_versions('index'), {'index': after['index']})
+
+    def test_group_rename_changes_author_pages(self):
+        """Новое название группы меняет ETag профиля и страницы поста...........
+        """
+        group = Group.objects.create(title='Old title', slug='test_slug')
+        post = Post.objects.create(author=self.user, group=group,
+                                   text='test text')
+        for url in (reverse('profile',
+                            kwargs={'username': self.user.username}),
+                    reverse('post', kwargs={'username': self.user.username,
+                                            'post_id': post.pk})):
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                group.title = f'New title {url}'
+                group.save()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertNotEqual(response['ETag'], etag)
+                self.assertContains(response, group.title)
+
+
+class StampedeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_stale_value_served_while_locked(self):
+        """Пока пересчёт заблокирован, отдаётся устаревшее значение.............
+        """
+        stampede.store('test_key', 'old', 60, version=1)
+        cache.add('test_key:lock', 1)
+        before = stampede.cache_stats()
+        value = stampede.get_or_set('test_key', lambda: 'new', 60, version=2)
+        self.assertEqual(value, 'old')
+        self.assertEqual(stampede.cache_stats()[stampede.STALE],
+                         before[stampede.STALE] + 1)
+
+    def test_stale_value_recomputed_once(self):
+        """Устаревшее значение пересчитывает тот, кто взял блокировку...........
+        """
+        stampede.store('test_key', 'old', 60, version=1)
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return 'new'
+
+        for _ in range(3):
+            value = stampede.get_or_set('test_key', compute, 60, version=2)
+            self.assertEqual(value, 'new')
+        self.assertEqual(len(calls), 1)
+        self.assertIsNone(cache.get('test_key:lock'))
+
+    def test_expired_value_is_stale(self):
+        """Истёкшая запись считается устаревшей, но ещё хранится................
+        """
+        stampede.store('test_key', 'old', -1)
+        self.assertEqual(stampede.lookup('test_key'), ('old', stampede.STALE))
+        stampede.store('test_key', 'fresh', 60)
+        self.assertEqual(stampede.lookup('test_key'),
+                         ('fresh', stampede.HIT))
+
+    def test_swr_cache_tag(self):
+        """Тег swr_cache кеширует фрагмент до смены поколения...................
+        """
+        fragment = Template(
+            '{% load swr_cache %}'
+            '{% swr_cache 60 test_fragment version=version %}'
+            '{{ value }}{% endswr_cache %}')
+        self.assertEqual(fragment.render(Context(
+            {'value': 'old', 'version': 1})), 'old')
+        self.assertEqual(fragment.render(Context(
+            {'value': 'new', 'version': 1})), 'old')
+        self.assertEqual(fragment.render(Context(
+            {'value': 'new', 'version': 2})), 'new')
+
+
+class PostCardTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='TestUser')
+        self.reader = User.objects.create_user(username='TestReader')
+        self.group = Group.objects.create(title='TestGroup', slug='test_slug')
+        self.posts = [Post.objects.create(author=self.user, text=f'text {i}',
+                                          group=self.group)
+                      for i in range(3)]
+
+    def test_cards_rendered_once(self):
+        """Карточки страницы читаются из кеша без повторного рендера............
+        """
+        first = render_cards(self.posts)
+        with self.assertTemplateNotUsed('posts/post_item.html'):
+            self.assertEqual(render_cards(self.posts), first)
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='test comment')
+        with self.assertTemplateUsed('posts/post_item.html', count=1):
+            render_cards(self.posts)
+        self.group.title = 'RenamedGroup'
+        self.group.save()
+        self.assertIn('RenamedGroup', render_cards(self.posts))
+        self.user.username = 'RenamedUser'
+        self.user.save()
+        posts = list(Post.objects.feed())
+        self.assertIn('@RenamedUser', render_cards(posts))
+
+    @override_settings(DATABASE_REPLICAS=['replica'], DATABASE_REPLICA_LAG=1)
+    def test_fresh_cards_cached_for_replica_lag(self):
+        """Карточки свежих правок хранятся не дольше отставания реплик..........
+        """
+        render_cards(self.posts)
+        time.sleep(1.1)
+        with self.assertTemplateUsed('posts/post_item.html', count=3):
+            render_cards(self.posts)
+        with self.assertTemplateNotUsed('posts/post_item.html'):
+            render_cards(self.posts)
+
+    def test_edit_button_only_for_author(self):
+        """Кнопка правки подставляется только в карточки автора.................
+        """
+        edit = reverse('post_edit', args=[self.user.username,
+                                          self.posts[0].pk])
+        render_cards(self.posts)
+        self.assertIn(edit, render_cards(self.posts, self.user))
+        self.assertNotIn(edit, render_cards(self.posts, self.reader))
+        self.assertNotIn(edit, render_cards(self.posts))
+
+
+class CompactCacheTest(SimpleTestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        config = cache_config(
+            'sqlite:///' + os.path.join(directory.name, 'cache.sqlite3'),
+            compress_min_bytes=100)
+        self.cache = CompactCache(config['LOCATION'], config)
+        self.inner = self.cache.backend
+
+    def test_values_are_compact(self):
+        """Крупные значения сжимаются, мелкие хранятся как есть.................
+        """
+        page = HttpResponse('<li>пост</li>' * 500)
+        self.cache.set('page', page)
+        self.cache.set('small', {'a': 1})
+        stored = self.inner.get('page')
+        self.assertEqual(stored[:1], COMPRESSED)
+        self.assertLess(len(stored), len(page.content) // 10)
+        self.assertEqual(self.inner.get('small')[:1], RAW)
+        self.assertEqual(self.cache.get('page').content, page.content)
+        self.assertEqual(self.cache.get_many(['small', 'missing']),
+                         {'small': {'a': 1}})
+
+    def test_sqlite_backend_operations(self):
+        """add атомарен, incr работает, просроченное не возвращается............
+        """
+        self.assertTrue(self.cache.add('lock', 1, 10))
+        self.assertFalse(self.cache.add('lock', 1, 10))
+        self.cache.set('count', 5)
+        self.assertEqual(self.cache.incr('count', 2), 7)
+        self.assertEqual(self.cache.get('count'), 7)
+        self.cache.set('gone', 'x', 0)
+        self.assertIsNone(self.cache.get('gone'))
+        self.assertTrue(self.cache.add('gone', 'y', 10))
+        self.cache.delete('lock')
+        self.assertFalse(self.cache.has_key('lock'))
+        with self.assertRaises(ValueError):
+            self.cache.incr('missing')
+
+    def test_sqlite_stores_bytes_once(self):
+        """SQLiteCache пишет байты CompactCache как есть, без второго pickle....
+        """
+        self.cache.set('small', {'a': 1})
+        self.cache.set('count', 5)
+        rows = dict(self.inner._db.execute(
+            'SELECT key, value FROM cache').fetchall())
+        self.assertEqual(rows[self.inner.make_key('small')],
+                         self.cache.encode({'a': 1}))
+        self.assertEqual(rows[self.inner.make_key('count')], 5)
+
+    def test_batch_write_culls(self):
+        """Пачка длиннее CULL_EVERY сразу удаляет лишние записи.................
+        """
+        config = cache_config('sqlite:///' + self.inner.path,
+                              max_entries=10)
+        config['OPTIONS']['OPTIONS']['CULL_EVERY'] = 20
+        compact = CompactCache(config['LOCATION'], config)
+        compact.set_many({f'key{number}': number for number in range(30)})
+        count, = compact.backend._db.execute(
+            'SELECT COUNT(*) FROM cache').fetchone()
+        self.assertLess(count, 30)
+
+    def test_usage_by_prefix(self):
+        """Отчёт группирует ключи по префиксам..................................
+        """
+        self.cache.set_many({'feed_version:index': 1,
+                             'feed_version:group:1': 2,
+                             'user_count': 3})
+        usage = cache_usage(self.cache)
+        self.assertEqual(usage['feed_version'][0], 2)
+        self.assertEqual(usage['user_count'][0], 1)
+        self.assertEqual(
+            key_prefix(':1:views.decorators.cache.cache_page.index_page.GET.'
+                       'abc.def.ru'), 'page:index_page')
+        self.assertEqual(key_prefix(':1:template.cache.index_page.abc'),
+                         'fragment:index_page')
+
+    def test_usage_command(self):
+        """Команда cache_usage печатает префиксы кеша по умолчанию..............
+        """
+        cache.clear()
+        cache.set('user_count', 1)
+        output = StringIO()
+        call_command('cache_usage', stdout=output)
+        self.assertIn('user_count', output.getvalue())
@@ -0,0 +1,145 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from ..counters import rebuild_counters
+from ..models import (Comment, FeedEntry, Follow, Group, Post, Profile,
+                      User)
+from ..search import SearchResults
+
+
+class SeedDataTest(TestCase):
+    def test_seed_data(self):
+        """seed_data создаёт данные и всё, что обычно делают сигналы............
+        """
+        call_command('seed_data', users=30, groups=3, posts=200,
+                     comments=100, follows=5, stdout=StringIO())
+        self.assertEqual(User.objects.count(), 30)
+        self.assertEqual(Profile.objects.count(), 30)
+        self.assertEqual(Post.objects.count(), 200)
+        self.assertEqual(Comment.objects.count(), 100)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(rebuild_counters(), 0)
+        follow = Follow.objects.first()
+        self.assertEqual(
+            FeedEntry.objects.filter(user=follow.user_id).count(),
+            Post.objects.filter(author__following__user=follow.user_id
+                                ).count())
+        post = Post.objects.first()
+        self.assertIn(post.pk, SearchResults(post.text).ids(0, 200))
+        # популярность авторов распределена неравномерно
+        counts = list(Profile.objects.order_by(
+            '-followers_count').values_list('followers_count', flat=True))
+        self.assertGreater(counts[0], counts[len(counts) // 2] * 2)
+
+
+class TransferTest(TestCase):
+    def setUp(self):
+        call_command('seed_data', users=10, groups=2, posts=30,
+                     comments=20, follows=3, stdout=StringIO())
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.post = Post.objects.select_related('author').order_by(
+            'pk').first()
+
+    def path(self, name):
+        return os.path.join(self.directory.name, name)
+
+    def clear(self):
+        User.objects.all().delete()
+        Group.objects.all().delete()
+
+    def assert_restored(self):
+        self.assertEqual(User.objects.count(), 10)
+        self.assertEqual(Profile.objects.count(), 10)
+        self.assertEqual(Group.objects.count(), 2)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 20)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.text, self.post.text)
+        self.assertEqual(post.pub_date, self.post.pub_date)
+        self.assertEqual(post.author.username, self.post.author.username)
+        self.assertEqual(rebuild_counters(), 0)
+        self.assertIn(post.pk, SearchResults(post.text).ids(0, 30))
+
+    def test_ndjson_round_trip(self):
+        """Выгрузка в NDJSON загружается обратно с датами и связями.............
+        """
+        follows = Follow.objects.count()
+        call_command('export_data', self.path('dump.ndjson'),
+                     stderr=StringIO())
+        self.clear()
+        call_command('import_data', self.path('dump.ndjson'),
+                     batch_size=7, stdout=StringIO())
+        self.assert_restored()
+        self.assertEqual(Follow.objects.count(), follows)
+        self.assertFalse(os.path.exists(self.path('dump.ndjson.checkpoint')))
+
+    def test_csv_round_trip(self):
+        """Выгрузка в каталог CSV загружается обратно...........................
+        """
+        call_command('export_data', self.path('dump'), format='csv',
+                     stderr=StringIO())
+        self.assertTrue(os.path.exists(self.path('dump/posts.csv')))
+        self.clear()
+        call_command('import_data', self.path('dump'), stdout=StringIO())
+        self.assert_restored()
+
+    def test_resume_from_checkpoint(self):
+        """Прерванный импорт продолжается с контрольной точки без дублей........
+        """
+        source = self.path('dump.ndjson')
+        call_command('export_data', source, stderr=StringIO())
+        with open(source) as dump:
+            lines = dump.readlines()
+        first_comment = next(number for number, line in enumerate(lines)
+                             if json.loads(line)['model'] == 'comments')
+        broken = json.loads(lines[first_comment])
+        with open(source, 'w') as dump:
+            dump.writelines(lines[:first_comment])
+            dump.write(json.dumps({**broken, 'post': 10 ** 6}) + '\n')
+            dump.writelines(lines[first_comment + 1:])
+        self.clear()
+        with self.assertRaises(CommandError):
+            call_command('import_data', source, batch_size=5,
+                         stdout=StringIO())
+        with open(f'{source}.checkpoint') as checkpoint:
+            done = json.load(checkpoint)['done']
+        self.assertLessEqual(done, first_comment)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertFalse(Comment.objects.exists())
+
+        with open(source, 'w') as dump:
+            dump.writelines(lines)
+        call_command('import_data', source, batch_size=5, stdout=StringIO())
+        self.assert_restored()
+
+    def test_repeated_import_skips_loaded_records(self):
+        """Повторный импорт той же выгрузки ничего не добавляет.................
+        """
+        source = self.path('dump.ndjson')
+        call_command('export_data', source, stderr=StringIO())
+        self.clear()
+        call_command('import_data', source, stdout=StringIO())
+        output = StringIO()
+        call_command('import_data', source, stdout=output)
+        self.assertIn('Импортировано записей: 0', output.getvalue())
+        self.assert_restored()
+
+    def test_taken_post_id_stops_import(self):
+        """Пост с занятым чужим постом id не теряется, а останавливает импорт...
+        """
+        source = self.path('dump.ndjson')
+        call_command('export_data', source, stderr=StringIO())
+        self.clear()
+        author = User.objects.create_user(username='local_user')
+        local = Post.objects.create(id=self.post.pk, author=author,
+                                    text='local post')
+        with self.assertRaises(CommandError):
+            call_command('import_data', source, stdout=StringIO())
+        self.assertFalse(Comment.objects.filter(post=local).exists())
+        self.assertEqual(Post.objects.get(pk=local.pk).text, 'local post')
@@ -0,0 +1,150 @@
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from .. import counters
+from ..models import Comment, Follow, Post, Profile, User
+
+
+class ProfileCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+
+    def setUp(self):
+        self.authorized_author = Client()
+        self.authorized_author.force_login(self.author)
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.reader)
+
+    def profile(self, user):
+        return Profile.objects.get(user=user)
+
+    def test_profile_created_with_user(self):
+        """Профиль создаётся вместе с пользователем.............................
+        """
+        self.assertTrue(Profile.objects.filter(user=self.author).exists())
+
+    def test_follow_counters(self):
+        """Подписка и отписка меняют счётчики обоих профилей....................
+        """
+        follow_url = reverse('profile_follow', kwargs={
+            'username': self.author.username})
+        self.authorized_reader.get(follow_url)
+        self.authorized_reader.get(follow_url)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+        self.authorized_reader.get(reverse('profile_unfollow', kwargs={
+            'username': self.author.username}))
+        self.assertEqual(self.profile(self.author).followers_count, 0)
+        self.assertEqual(self.profile(self.reader).following_count, 0)
+
+    def test_post_counters(self):
+        """Создание и удаление поста меняют счётчик записей.....................
+        """
+        self.authorized_author.post(reverse('new_post'),
+                                    data={'text': 'test counter text'})
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        post = Post.objects.get(text='test counter text')
+        self.authorized_author.get(reverse('post_delete', kwargs={
+            'id': post.id}))
+        self.assertEqual(self.profile(self.author).posts_count, 0)
+
+    def test_rebuild_counters_command(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики............
+        """
+        Post.objects.create(author=self.author, text='test text')
+        Follow.objects.create(user=self.reader, author=self.author)
+        Profile.objects.filter(user=self.reader).delete()
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        self.assertIn('2', out.getvalue())
+        self.assertEqual(self.profile(self.author).posts_count, 1)
+        self.assertEqual(self.profile(self.author).followers_count, 1)
+        self.assertEqual(self.profile(self.reader).following_count, 1)
+
+
+class CommentCountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.reader = User.objects.create_user(username='TestReader')
+
+    def setUp(self):
+        self.post = Post.objects.create(author=self.author, text='test text')
+        self.authorized_reader = Client()
+        self.authorized_reader.force_login(self.reader)
+
+    def comment(self):
+        self.authorized_reader.post(reverse('add_comment', kwargs={
+            'username': self.author.username, 'post_id': self.post.id}),
+            data={'text': 'test comment'})
+        return Comment.objects.order_by('-created', '-pk').first()
+
+    def test_comment_counters(self):
+        """Комментарий и его удаление меняют счётчик и время последнего.........
+        """
+        first = self.comment()
+        last = self.comment()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.last_comment_at, last.created)
+        self.authorized_reader.get(reverse('comment_delete', kwargs={
+            'id': last.id}))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_comment_at, first.created)
+        counters.delete_comment(first)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertIsNone(self.post.last_comment_at)
+
+    def test_post_edit_keeps_comment_counters(self):
+        """Правка поста не затирает счётчики комментариев, пришедших после......
+        """
+        stale = Post.objects.get(pk=self.post.pk)
+        comment = self.comment()
+        stale.text = 'edited text'
+        counters.edit_post(stale)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.text, 'edited text')
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_comment_at, comment.created)
+
+    def test_delete_comment_after_cascade(self):
+        """Удаление автора комментариев уменьшает счётчики постов...............
+        """
+        first = self.comment()
+        commenter = User.objects.create_user(username='TestCommenter')
+        counters.add_comment(Comment(post=self.post, author=commenter,
+                                     text='cascade comment'))
+        commenter.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 1)
+        self.assertEqual(self.post.last_comment_at, first.created)
+
+    def test_rebuild_comment_counters(self):
+        """Пересчёт исправляет только посты с разошедшимися счётчиками..........
+        """
+        Post.objects.create(author=self.author, text='no comments')
+        self.comment()
+        self.assertEqual(counters.rebuild_comment_counters(), 0)
+        comment = Comment.objects.create(post=self.post, author=self.author,
+                                         text='bulk comment')
+        self.assertEqual(counters.rebuild_comment_counters(), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 2)
+        self.assertEqual(self.post.last_comment_at, comment.created)
+        Comment.objects.all().delete()
+        Post.objects.filter(pk=self.post.pk).update(comment_count=2)
+        out = StringIO()
+        call_command('rebuild_counters', stdout=out)
+        self.assertIn('Исправлено постов: 1', out.getvalue())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comment_count, 0)
+        self.assertIsNone(self.post.last_comment_at)
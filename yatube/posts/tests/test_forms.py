@@ -1,10 +1,12 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
+from PIL import Image
 
 from ..models import Group, Post, User
 
@@ -73,3 +75,95 @@ class TestsPostForm(TestCase):
                          'another test text form')
         self.assertTrue(Post.objects.filter(text='another test text form',
                         id=self.post.id, group=self.group.id).exists())
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, IMAGE_UPLOAD_MAX_SIZE=(100, 100))
+class TestsImageUpload(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='test_user')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.author)
+
+    def upload(self, size):
+        image = Image.new('RGB', size, 'red')
+        exif = Image.Exif()
+        exif[0x010F] = 'TestCamera'
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', exif=exif.tobytes())
+        uploaded = SimpleUploadedFile('photo.jpg', buffer.getvalue(),
+                                      content_type='image/jpeg')
+        return self.authorized_user.post(reverse('new_post'), data={
+            'text': 'test text form', 'image': uploaded})
+
+    def test_upload_is_normalized(self):
+        """Загрузка уменьшается, теряет EXIF, а размеры пишутся в модель........
+        """
+        self.upload((400, 200))
+        post = Post.objects.get()
+        self.assertEqual((post.image_width, post.image_height), (100, 50))
+        self.assertEqual(post.image_size, post.image.size)
+        with post.image.open('rb'):
+            stored = Image.open(post.image)
+            self.assertEqual(stored.size, (100, 50))
+            self.assertNotIn('exif', stored.info)
+
+    def test_animation_is_normalized(self):
+        """Каждый кадр анимации уменьшается и теряет EXIF.......................
+        """
+        for format_, name in (('GIF', 'anim.gif'), ('WEBP', 'anim.webp')):
+            with self.subTest(format=format_):
+                Post.objects.all().delete()
+                frames = [Image.new('RGB', (400, 200), color)
+                          for color in ('red', 'green', 'blue')]
+                exif = Image.Exif()
+                exif[0x010F] = 'TestCamera'
+                buffer = BytesIO()
+                frames[0].save(buffer, format_, save_all=True,
+                               append_images=frames[1:], duration=50,
+                               loop=0, exif=exif.tobytes())
+                self.authorized_user.post(reverse('new_post'), data={
+                    'text': 'test text form',
+                    'image': SimpleUploadedFile(name, buffer.getvalue())})
+                post = Post.objects.get()
+                self.assertEqual((post.image_width, post.image_height),
+                                 (100, 50))
+                with post.image.open('rb'):
+                    stored = Image.open(post.image)
+                    self.assertEqual(stored.format, format_)
+                    self.assertEqual(stored.n_frames, 3)
+                    self.assertEqual(stored.size, (100, 50))
+                    self.assertNotIn('exif', stored.info)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=10000)
+    def test_long_animation_is_rejected(self):
+        """Анимация, чьи кадры вместе больше лимита пикселей, не сохраняется....
+        """
+        frames = [Image.new('RGB', (10, 10), ('red', 'blue')[number % 2])
+                  for number in range(500)]
+        buffer = BytesIO()
+        frames[0].save(buffer, 'GIF', save_all=True,
+                       append_images=frames[1:], duration=20)
+        response = self.authorized_user.post(reverse('new_post'), data={
+            'text': 'test text form',
+            'image': SimpleUploadedFile('long.gif', buffer.getvalue())})
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(response, 'form', 'image',
+                             'Слишком много кадров в анимации')
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=1000)
+    def test_decompression_bomb_is_rejected(self):
+        """Изображение со слишком большим разрешением не сохраняется............
+        """
+        response = self.upload((400, 200))
+        self.assertFalse(Post.objects.exists())
+        self.assertFormError(response, 'form', 'image',
+                             'Слишком большое разрешение изображения')
@@ -1,14 +1,28 @@
 import shutil
 import tempfile
+from io import BytesIO
 
 from django.conf import settings
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase, override_settings
+from django.core.cache import cache
+from django.test import (Client, TestCase, TransactionTestCase,
+                         override_settings)
 from django.urls import reverse
+from PIL import Image
 
-from ..models import Group, Post, User
+from .. import thumbnails
+from ..cache import post_scopes
+from ..models import Group, Post, Profile, User
 
 TEMP_MEDIA = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA)
@@ -50,6 +64,7 @@ class TestPostImages(TestCase):
         super().tearDownClass()
 
     def setUp(self):
+        cache.clear()
         self.authorized_user = Client()
         self.authorized_user.force_login(self.user)
 
@@ -60,3 +75,125 @@ class TestPostImages(TestCase):
             with self.subTest(reverse_name=reverse_name):
                 response = self.authorized_user.get(reverse_name)
                 self.assertContains(response, '<img')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA, THUMBNAIL_WORKERS=0)
+class ThumbnailPregenerationTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='test_user')
+
+    def tearDown(self):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+
+    def test_missing_thumbnail_is_placeholder(self):
+        """Страница не ждёт миниатюру, а выводит заглушку.......................
+        """
+        Post.objects.bulk_create([Post(
+            author=self.user, text='Test post text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))])
+        post = Post.objects.get()
+        geometry, options = thumbnails.POST_THUMBNAILS[0]
+        thumbnail = thumbnails.ready_thumbnail(post.image, geometry,
+                                               **options)
+        self.assertTrue(thumbnail.is_placeholder)
+        response = Client().get(reverse('index'))
+        self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER_URL)
+
+    def test_ready_thumbnail_replaces_cached_placeholder(self):
+        """Готовые миниатюры сбрасывают страницы, закешированные с заглушкой....
+        """
+        Post.objects.bulk_create([Post(
+            author=self.user, text='Test post text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))])
+        post = Post.objects.get()
+        client = Client()
+        response = client.get(reverse('index'))
+        self.assertContains(response, settings.THUMBNAIL_PLACEHOLDER_URL)
+        thumbnails.enqueue(post.image, thumbnails.POST_THUMBNAILS,
+                           variants=True,
+                           scopes=post_scopes(post.pk, post.author_id,
+                                              post.group_id))
+        response = client.get(reverse('index'))
+        self.assertNotContains(response, settings.THUMBNAIL_PLACEHOLDER_URL)
+
+    def test_upload_pregenerates_thumbnail(self):
+        """Миниатюра создаётся после загрузки и отдаётся без заглушки...........
+        """
+        post = Post.objects.create(
+            author=self.user, text='Test post text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        geometry, options = thumbnails.POST_THUMBNAILS[0]
+        thumbnail = thumbnails.ready_thumbnail(post.image, geometry,
+                                               **options)
+        self.assertFalse(getattr(thumbnail, 'is_placeholder', False))
+        self.assertTrue(thumbnail.exists())
+
+    def test_deferred_profile_photo(self):
+        """Отложенное фото не читается при загрузке, новое получает миниатюры...
+        """
+        with self.assertNumQueries(1):
+            self.assertEqual(len(Profile.objects.only('posts_count')), 1)
+        profile = Profile.objects.defer('photo').get()
+        profile.photo = SimpleUploadedFile('small.gif', SMALL_GIF)
+        profile.save()
+        geometry, options = thumbnails.PHOTO_THUMBNAILS[0]
+        thumbnail = thumbnails.ready_thumbnail(profile.photo, geometry,
+                                               **options)
+        self.assertFalse(getattr(thumbnail, 'is_placeholder', False))
+
+    def test_upload_creates_responsive_variants(self):
+        """После загрузки карточка выводит <picture> с вариантами...............
+        """
+        post = Post.objects.create(
+            author=self.user, text='Test post text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))
+        variants = thumbnails.image_variants(post.image)
+        types = [source['type'] for source in variants['sources']]
+        self.assertIn('image/webp', types)
+        self.assertIn('image/jpeg', types)
+        self.assertTrue(post.image.storage.exists(
+            f'{thumbnails.variants_dir(post.image.name)}/320.jpg'))
+        response = Client().get(reverse('index'))
+        self.assertContains(response, '<picture>')
+        self.assertContains(response, variants['fallback'])
+
+    def test_variants_of_same_stem_do_not_clash(self):
+        """cat.gif и cat.png получают разные каталоги вариантов.................
+        """
+        buffer = BytesIO()
+        Image.new('RGB', (700, 300), 'red').save(buffer, 'PNG')
+        gif = Post.objects.create(
+            author=self.user, text='Test gif',
+            image=SimpleUploadedFile('cat.gif', SMALL_GIF))
+        png = Post.objects.create(
+            author=self.user, text='Test png',
+            image=SimpleUploadedFile('cat.png', buffer.getvalue()))
+        gif_variants = thumbnails.image_variants(gif.image)
+        png_variants = thumbnails.image_variants(png.image)
+        self.assertIn(thumbnails.variants_dir(gif.image.name),
+                      gif_variants['fallback'])
+        self.assertIn(thumbnails.variants_dir(png.image.name),
+                      png_variants['fallback'])
+        self.assertNotIn('640w', gif_variants['sources'][0]['srcset'])
+        self.assertIn('640w', png_variants['sources'][0]['srcset'])
+
+    def test_missing_variants_are_cached(self):
+        """Отсутствие вариантов запоминается до их создания.....................
+        """
+        Post.objects.bulk_create([Post(
+            author=self.user, text='Test post text',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF))])
+        post = Post.objects.get()
+        key = thumbnails.VARIANTS_KEY.format(post.image.name)
+        self.assertIsNone(thumbnails.image_variants(post.image))
+        self.assertEqual(cache.get(key), [])
+        thumbnails.make_variants(post.image.name)
+        self.assertIsNotNone(thumbnails.image_variants(post.image))
+
+    def test_path_outside_storage_has_no_variants(self):
+        """Путь вне хранилища не ломает карточку................................
+        """
+        post = Post(author=self.user, text='Test post text',
+                    image='../outside.gif')
+        self.assertIsNone(thumbnails.image_variants(post.image))
@@ -0,0 +1,79 @@
+import re
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from ..models import Comment, Follow, Group, Post, User
+
+FEED_TABLES = ('posts_post', 'posts_comment', 'posts_follow',
+               'posts_feedentry')
+# полный проход таблицы, а не диапазон или обход индекса по порядку
+FULL_SCAN = re.compile(r'\bSCAN (?:TABLE )?(\w+)(?! USING)')
+
+
+class FeedIndexesTest(TestCase):
+    """
+    Планы всех запросов лент к постам, комментариям и подпискам:
+    ни полного прохода таблицы, ни сортировки во временном B-дереве.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        for number in range(15):
+            post = Post.objects.create(author=cls.author, group=cls.group,
+                                       text=f'Пост {number}')
+        for number in range(5):
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text=f'Комментарий {number}')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        cls.post = post
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.reader)
+
+    def plans(self, url):
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        with connection.cursor() as cursor:
+            for query in captured:
+                sql = query['sql']
+                if not sql.startswith('SELECT') or not any(
+                        table in sql for table in FEED_TABLES):
+                    continue
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+                yield sql, [row[-1] for row in cursor.fetchall()]
+
+    def test_feed_queries_use_indexes(self):
+        """Запросы лент идут по индексам без полного прохода и сортировки.......
+        """
+        if connection.vendor != 'sqlite':
+            self.skipTest('разбирается план SQLite')
+        post_args = {'username': self.author.username,
+                     'post_id': self.post.pk}
+        urls = (
+            reverse('index'),
+            reverse('discussed'),
+            reverse('group', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs=post_args),
+            reverse('post_comments', kwargs=post_args),
+            reverse('follow_index'),
+        )
+        for url in urls:
+            for sql, plan in self.plans(url):
+                with self.subTest(url=url, sql=sql):
+                    for step in plan:
+                        match = FULL_SCAN.search(step)
+                        self.assertFalse(
+                            match and match.group(1) in FEED_TABLES, plan)
+                        self.assertNotIn('TEMP B-TREE', step, plan)
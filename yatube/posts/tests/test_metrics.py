@@ -0,0 +1,69 @@
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.metrics import registry
+
+from ..models import Post, User
+
+
+class MetricsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.create(author=cls.user, text='Тестовый пост')
+
+    def setUp(self):
+        cache.clear()
+        registry.clear()
+        self.client = Client()
+
+    @override_settings(METRICS_SAMPLE_RATE=1.0)
+    def test_sampled_request_has_server_timing(self):
+        """Запрос из выборки получает Server-Timing и попадает в /metrics.......
+        """
+        response = self.client.get(reverse('index'))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('tpl;dur=', timing)
+        # страница и фрагмент ленты в swr_cache, карточка поста
+        self.assertIn('cache;desc="card_miss=1 miss=2"', timing)
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_db_queries_bucket{view="index",le="+Inf"} 1',
+                      metrics)
+        self.assertIn('yatube_template_render_seconds_count{view="index"} 1',
+                      metrics)
+        self.assertIn(
+            'yatube_cache_events_total{view="index",event="miss"} 2',
+            metrics)
+
+    @override_settings(METRICS_SAMPLE_RATE=0)
+    def test_unsampled_request_only_counts_duration(self):
+        """Запрос вне выборки учитывается только временем ответа................
+        """
+        response = self.client.get(reverse('index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        metrics = self.client.get(reverse('metrics')).content.decode()
+        self.assertIn('yatube_request_duration_seconds_count{view="index"} 1',
+                      metrics)
+        self.assertNotIn('yatube_db_queries', metrics)
+
+    def test_metrics_are_internal(self):
+        """/metrics недоступен снаружи..........................................
+        """
+        response = self.client.get(reverse('metrics'),
+                                   REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, 404)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_metrics_need_token_behind_proxy(self):
+        """С METRICS_TOKEN /metrics отдаётся только по токену, а не по адресу...
+        """
+        url = reverse('metrics')
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(
+            url, HTTP_AUTHORIZATION='Bearer wrong').status_code, 404)
+        self.assertEqual(self.client.get(
+            url, REMOTE_ADDR='10.0.0.1',
+            HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
@@ -0,0 +1,116 @@
+import base64
+import json
+
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Post, User
+from ..paginator import KeysetPaginator
+
+POSTS_COUNT = 25
+PAGE_COUNT = 10
+
+
+class KeysetPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {number}')
+            for number in range(POSTS_COUNT))
+        # одинаковое время публикации: порядок держится на id
+        Post.objects.update(pub_date=Post.objects.first().pub_date)
+
+    def setUp(self):
+        self.client = Client()
+
+    def walk(self, paginator_kwargs=None):
+        paginator_kwargs = paginator_kwargs or {}
+        paginator = KeysetPaginator(Post.objects.all(), PAGE_COUNT,
+                                    **paginator_kwargs)
+        page = paginator.get_page(1)
+        pages = [page]
+        while page.next_cursor:
+            paginator = KeysetPaginator(Post.objects.all(), PAGE_COUNT,
+                                        **paginator_kwargs)
+            page = paginator.get_page(None, cursor=page.next_cursor)
+            pages.append(page)
+        return pages
+
+    def test_cursor_walk_matches_offset_pages(self):
+        """Проход по курсорам даёт те же записи, что и OFFSET..................
+        """
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        pages = self.walk()
+        self.assertEqual([page.number for page in pages], [1, 2, 3])
+        walked = [post for page in pages for post in page.object_list]
+        self.assertEqual(walked, expected)
+
+    def test_previous_cursor_returns_previous_page(self):
+        """Курсор «назад» возвращает предыдущую страницу.......................
+        """
+        pages = self.walk()
+        paginator = KeysetPaginator(Post.objects.all(), PAGE_COUNT)
+        page = paginator.get_page(None, cursor=pages[2].previous_cursor)
+        self.assertEqual(page.number, 2)
+        self.assertEqual(list(page.object_list),
+                         list(pages[1].object_list))
+
+    def test_approximate_count(self):
+        """Приблизительный подсчёт ограничен окном lookahead...................
+        """
+        paginator = KeysetPaginator(Post.objects.all(), PAGE_COUNT,
+                                    approximate=True, lookahead=1)
+        page = paginator.get_page(1)
+        self.assertEqual(paginator.count, PAGE_COUNT * 2 + 1)
+        self.assertFalse(paginator.count_is_exact)
+        self.assertIsNotNone(page.next_cursor)
+        walked = self.walk({'approximate': True, 'lookahead': 1})
+        self.assertEqual(sum(len(page) for page in walked), POSTS_COUNT)
+        self.assertTrue(walked[-1].paginator.count_is_exact)
+
+    def test_approximate_page_out_of_range(self):
+        """Номер страницы за концом ленты даёт последнюю страницу...............
+        """
+        paginator = KeysetPaginator(Post.objects.all(), PAGE_COUNT,
+                                    approximate=True, lookahead=1)
+        page = paginator.get_page(9999)
+        self.assertEqual(page.number, 3)
+        self.assertEqual(len(page), POSTS_COUNT - PAGE_COUNT * 2)
+        self.assertEqual(list(page.window), [1, 2, 3])
+        self.assertIsNone(page.next_cursor)
+
+    def test_broken_cursor_falls_back_to_page(self):
+        """Испорченный курсор не ломает страницу................................
+        """
+        cache.clear()
+        response = self.client.get(reverse('index'),
+                                   {'cursor': 'broken', 'page': 2})
+        self.assertEqual(response.context['page'].number, 2)
+
+    def test_null_cursor_falls_back_to_first_page(self):
+        """Курсор с пустыми или составными значениями даёт первую страницу......
+        """
+        for values in ([None, None], [[1], {'a': 1}], [True, 1]):
+            with self.subTest(values=values):
+                cursor = base64.urlsafe_b64encode(
+                    json.dumps([2, 'next', values]).encode()).decode()
+                cache.clear()
+                response = self.client.get(reverse('index'),
+                                           {'cursor': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.context['page'].number, 1)
+
+    @override_settings(PAGINATOR_APPROXIMATE_COUNT=True)
+    def test_index_cursor_links(self):
+        """Ссылка «Следующая» на главной ведёт по курсору......................
+        """
+        cache.clear()
+        response = self.client.get(reverse('index'))
+        page = response.context['page']
+        self.assertContains(response, f'?cursor={page.next_cursor}')
+        response = self.client.get(reverse('index'),
+                                   {'cursor': page.next_cursor})
+        self.assertEqual(response.context['page'].number, 2)
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User as AdminUser
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Group, Post, User
+from ..search import SearchResults, rebuild, use_fts
+
+
+class SearchMixin:
+    def setUp(self):
+        self.user = User.objects.create_user(username='TestUser')
+        self.group = Group.objects.create(title='Котики', slug='cats')
+        self.post = Post.objects.create(
+            author=self.user, text='Рыжий кот спит на диване')
+        self.group_post = Post.objects.create(
+            author=self.user, text='Кот и кот гуляют', group=self.group)
+        Post.objects.create(author=self.user, text='Собака лает')
+        self.client = Client()
+
+    def find(self, query):
+        results = SearchResults(query)
+        return results.ids(0, results.count())
+
+    def test_ranked_prefix_search(self):
+        """Поиск по префиксу находит все формы слова, частые выше...............
+        """
+        self.assertEqual(self.find('кот'),
+                         [self.group_post.pk, self.post.pk])
+        self.assertEqual(self.find('рыж кот'), [self.post.pk])
+        self.assertEqual(self.find('котики'), [self.group_post.pk])
+        self.assertEqual(self.find(''), [])
+
+    def test_index_follows_changes(self):
+        """Правка поста и группы, удаление поста обновляют индекс...............
+        """
+        self.post.text = 'Теперь про попугая'
+        self.post.save()
+        self.assertEqual(self.find('рыжий'), [])
+        self.assertEqual(self.find('попугая'), [self.post.pk])
+        self.group.title = 'Кошки'
+        self.group.save()
+        self.assertEqual(self.find('кошки'), [self.group_post.pk])
+        self.group_post.delete()
+        self.assertEqual(self.find('кот'), [])
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(self.find('попугая'), [self.post.pk])
+
+    @override_settings(PAGINATOR_COUNT=1)
+    def test_search_view_is_paginated(self):
+        """Страница /search/ выводит найденные записи постранично...............
+        """
+        response = self.client.get(reverse('search'), {'q': 'кот'})
+        page = response.context['page']
+        self.assertEqual(page.paginator.count, 2)
+        self.assertEqual(list(page), [self.group_post])
+        self.assertContains(response, '?q=%D0%BA%D0%BE%D1%82&amp;page=2')
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через индекс....................................
+        """
+        admin = AdminUser.objects.create_superuser(
+            'admin', 'admin@example.com', 'password')
+        self.client.force_login(admin)
+        response = self.client.get(reverse('admin:posts_post_changelist'),
+                                   {'q': 'котики'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.group_post])
+
+
+class FtsSearchTest(SearchMixin, TestCase):
+    def test_backend(self):
+        """На SQLite используется FTS5.........................................
+        """
+        self.assertTrue(use_fts())
+
+
+@override_settings(SEARCH_BACKEND='python')
+class InvertedIndexSearchTest(SearchMixin, TestCase):
+    def test_backend(self):
+        """Обратный индекс работает без FTS5....................................
+        """
+        self.assertFalse(use_fts())
@@ -0,0 +1,65 @@
+from copy import deepcopy
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template import engines
+from django.template.loader_tags import IncludeNode
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from yatube.templating import (InlinedTemplate, template_loaders,
+                               warm_templates)
+
+from ..models import Group, Post, User
+
+
+def cached_templates():
+    templates = deepcopy(settings.TEMPLATES)
+    templates[0]['OPTIONS']['loaders'] = template_loaders(cache=True)
+    return templates
+
+
+@override_settings(TEMPLATES=cached_templates())
+class CachedTemplatesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(title='TestGroup', slug='test_slug')
+        Post.objects.create(author=cls.user, group=cls.group,
+                            text='test cached text')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_warm_up_compiles_app_templates(self):
+        """Прогрев компилирует шаблоны posts, users, about и misc...............
+        """
+        compiled = warm_templates()
+        for name in ('posts/index.html', 'posts/post_item.html',
+                     'misc/base.html', 'about/author.html', 'signup.html'):
+            self.assertIn(name, compiled)
+        self.assertNotIn('admin/base_site.html', compiled)
+
+    def test_static_includes_inlined(self):
+        """Include с постоянным именем заменяется скомпилированным шаблоном.....
+        """
+        engine = engines.all()[0].engine
+        template = engine.get_template('posts/index.html')
+        includes = template.nodelist.get_nodes_by_type(IncludeNode)
+        self.assertTrue(includes)
+        for node in includes:
+            self.assertIsInstance(node.template, InlinedTemplate)
+        self.assertIs(includes[0].template.template,
+                      engine.get_template('posts/menu.html'))
+
+    def test_pages_render(self):
+        """Страницы рендерятся так же, как без кеша шаблонов....................
+        """
+        client = Client()
+        for url in (reverse('index'),
+                    reverse('group', kwargs={'slug': self.group.slug}),
+                    reverse('profile',
+                            kwargs={'username': self.user.username})):
+            with self.subTest(url=url):
+                response = client.get(url)
+                self.assertContains(response, 'test cached text')
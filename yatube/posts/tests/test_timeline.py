@@ -0,0 +1,81 @@
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import FeedEntry, Follow, Post, Profile, User
+from ..timeline import rebuild_feeds
+
+POSTS_COUNT = 13
+
+
+class FollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='TestReader')
+        cls.author = User.objects.create_user(username='TestAuthor')
+        cls.star = User.objects.create_user(username='TestStar')
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.reader)
+
+    def follow(self, author):
+        self.authorized_user.get(reverse('profile_follow', kwargs={
+            'username': author.username}))
+
+    def feed_texts(self, **params):
+        response = self.authorized_user.get(reverse('follow_index'), params)
+        return [post.text for post in response.context['page']], response
+
+    def test_new_post_fanned_out(self):
+        """Новый пост попадает в материализованную ленту подписчика............
+        """
+        self.follow(self.author)
+        post = Post.objects.create(author=self.author, text='test fan out')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post, pub_date=post.pub_date).exists())
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка добавляет посты автора в ленту, отписка убирает.............
+        """
+        Post.objects.create(author=self.author, text='test old post')
+        self.follow(self.author)
+        self.assertEqual(FeedEntry.objects.filter(user=self.reader).count(), 1)
+        self.authorized_user.get(reverse('profile_unfollow', kwargs={
+            'username': self.author.username}))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_pull_author_merged_on_read(self):
+        """Посты популярного автора подмешиваются в ленту при чтении............
+        """
+        Profile.objects.filter(user=self.star).update(followers_count=1)
+        self.follow(self.author)
+        self.follow(self.star)
+        for number in range(POSTS_COUNT):
+            Post.objects.create(author=self.author, text=f'author {number}')
+            Post.objects.create(author=self.star, text=f'star {number}')
+        self.assertTrue(Profile.objects.get(user=self.star).feed_pull)
+        self.assertFalse(FeedEntry.objects.filter(
+            post__author=self.star).exists())
+        expected = list(Post.objects.filter(
+            author__in=(self.author, self.star)).order_by(
+            '-pub_date', '-pk').values_list('text', flat=True))
+        texts, response = self.feed_texts()
+        walked = texts
+        while response.context['page'].next_cursor:
+            texts, response = self.feed_texts(
+                cursor=response.context['page'].next_cursor)
+            walked += texts
+        self.assertEqual(walked, expected)
+        self.assertEqual(response.context['paginator'].count, len(expected))
+
+    def test_rebuild_feeds(self):
+        """rebuild_feeds восстанавливает ленты по подпискам.....................
+        """
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.author, text='test text')
+        FeedEntry.objects.all().delete()
+        rebuild_feeds()
+        texts, _ = self.feed_texts()
+        self.assertEqual(texts, ['test text'])
@@ -2,13 +2,18 @@ from http import HTTPStatus
 
 from django import forms
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
-from ..models import Follow, Group, Post, User
+from .. import counters
+from ..models import Comment, Follow, Group, Post, Profile, User
 
 POSTS_COUNT = 13
 PAGE_COUNT = 10
+FEED_QUERY_BUDGET = 8
+COMMENTS_PAGE_SIZE = 5
 
 
 class PostPagesTests(TestCase):
@@ -117,6 +122,17 @@ class PostPagesTests(TestCase):
                 context = response.context[value]
                 self.assertEqual(context, expect)
 
+    def test_post_without_author_profile(self):
+        """Страница поста открывается у автора без профиля......................
+        """
+        author = User.objects.create_user(username='NoProfile')
+        Profile.objects.filter(user=author).delete()
+        post = Post.objects.create(author=author, text='test no profile')
+        response = self.authorized_user.get(reverse('post', kwargs={
+            'username': author.username, 'post_id': post.id}))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertIsNone(response.context['data'])
+
     def test_post_not_in_wrong_group(self):
         """Проверка что post не попал ни в ту группу............................
         и попал в нужную"""
@@ -255,7 +271,7 @@ class TestFollow(TestCase):
         self.authorized_user.get(reverse('profile_follow', kwargs={
             'username': self.user.username}))
         response = self.authorized_user.get(reverse('follow_index'))
-        post = response.context['post']
+        post = response.context['page'][0]
         self.assertEqual(post.text, 'test follow text')
         self.assertEqual(post.author, self.user)
         self.assertEqual(post.group.id, self.group.id)
@@ -308,3 +324,204 @@ class TestComments(TestCase):
         response = self.authorized_user.post(self.url_comment, {
             'text': 'test comment'}, follow=True)
         self.assertContains(response, 'test comment')
+
+
+class FeedQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.reader = User.objects.create_user(username='TestReader')
+        Profile.objects.get_or_create(user=cls.user)
+        cls.group = Group.objects.create(title='TestGroup',
+                                         slug='test_slug',
+                                         description='Test description')
+        Follow.objects.create(user=cls.reader, author=cls.user)
+        cls.feed_urls = (
+            reverse('index'),
+            reverse('discussed'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            reverse('follow_index'),
+        )
+
+    def setUp(self):
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.reader)
+
+    def add_posts(self, count):
+        for number in range(count):
+            post = Post.objects.create(author=self.user, group=self.group,
+                                       text=f'Пост {number}')
+            counters.add_comment(Comment(post=post, author=self.reader,
+                                         text='Комментарий'))
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_user.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return len(queries)
+
+    def test_feed_queries_do_not_depend_on_posts(self):
+        """Число запросов ленты не зависит от числа постов на странице..........
+        """
+        self.add_posts(1)
+        single = {url: self.count_queries(url) for url in self.feed_urls}
+        self.add_posts(PAGE_COUNT)
+        for url in self.feed_urls:
+            with self.subTest(url=url):
+                queries = self.count_queries(url)
+                self.assertEqual(queries, single[url])
+                self.assertLessEqual(queries, FEED_QUERY_BUDGET)
+
+    def test_comment_count_column(self):
+        """Карточка показывает число комментариев из столбца поста..............
+        """
+        self.add_posts(1)
+        cache.clear()
+        response = self.authorized_user.get(reverse('index'))
+        self.assertEqual(response.context['page'][0].comment_count, 1)
+        self.assertContains(response, 'Комментариев: 1')
+
+    @override_settings(STREAM_CHUNK_SIZE=2)
+    def test_profile_all_streams_posts(self):
+        """Все посты автора отдаются потоком за постоянное число запросов.......
+        """
+        url = reverse('profile_all', kwargs={'username': self.user.username})
+
+        def stream():
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = self.authorized_user.get(url)
+                self.assertTrue(response.streaming)
+                chunks = [chunk.decode()
+                          for chunk in response.streaming_content]
+            return chunks, len(queries)
+
+        self.add_posts(1)
+        _, single = stream()
+        self.add_posts(PAGE_COUNT)
+        chunks, queries = stream()
+        self.assertEqual(queries, single)
+        # шапка, пачки карточек по две и подвал
+        self.assertEqual(len(chunks), 2 + (PAGE_COUNT + 2) // 2)
+        self.assertIn('@TestUser', chunks[0])
+        content = ''.join(chunks)
+        positions = [content.index(f'name="post_{pk}"') for pk in
+                     Post.objects.order_by('-pub_date', '-pk').values_list(
+                         'pk', flat=True)]
+        self.assertEqual(positions, sorted(positions))
+
+
+@override_settings(COMMENTS_PAGE_SIZE=COMMENTS_PAGE_SIZE)
+class CommentQueriesTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+        cls.post_url = reverse('post', kwargs={
+            'username': cls.user.username, 'post_id': cls.post.id})
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.user)
+
+    def add_comments(self, count):
+        for number in range(count):
+            author = User.objects.create_user(
+                username=f'Reader{Comment.objects.count()}')
+            Comment.objects.create(post=self.post, author=author,
+                                   text=f'Комментарий {number}')
+
+    def count_queries(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.authorized_user.get(self.post_url)
+        return response, len(queries)
+
+    def test_comment_queries_do_not_depend_on_comments(self):
+        """Число запросов страницы поста не зависит от числа комментариев.......
+        """
+        self.add_comments(1)
+        # первый запрос заодно кеширует число пользователей для подвала
+        self.count_queries()
+        _, single = self.count_queries()
+        self.add_comments(COMMENTS_PAGE_SIZE * 2)
+        response, queries = self.count_queries()
+        self.assertEqual(queries, single)
+        self.assertEqual(len(response.context['comments']),
+                         COMMENTS_PAGE_SIZE)
+
+    def test_load_more_comments(self):
+        """«Показать ещё» подгружает следующую порцию по курсору................
+        """
+        self.add_comments(COMMENTS_PAGE_SIZE + 2)
+        response = self.authorized_user.get(self.post_url)
+        cursor = response.context['comments'].next_cursor
+        self.assertContains(response, 'Показать ещё')
+        response = self.authorized_user.get(
+            reverse('post_comments', kwargs={
+                'username': self.user.username, 'post_id': self.post.id}),
+            {'cursor': cursor})
+        comments = list(response.context['comments'])
+        self.assertEqual([comment.text for comment in comments],
+                         ['Комментарий 1', 'Комментарий 0'])
+        self.assertNotContains(response, 'Показать ещё')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='TestUser')
+        cls.group = Group.objects.create(title='TestGroup',
+                                         slug='test_slug')
+        cls.post = Post.objects.create(author=cls.user, group=cls.group,
+                                       text='Тестовый пост')
+        cls.post_url = reverse('post', kwargs={
+            'username': cls.user.username, 'post_id': cls.post.id})
+        cls.urls = (
+            reverse('index'),
+            reverse('group', kwargs={'slug': cls.group.slug}),
+            reverse('profile', kwargs={'username': cls.user.username}),
+            cls.post_url,
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.authorized_user = Client()
+        self.authorized_user.force_login(self.user)
+
+    def test_repeat_request_is_not_modified(self):
+        """Повторный запрос с ETag получает 304 без рендеринга..................
+        """
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.authorized_user.get(url)['ETag']
+                response = self.authorized_user.get(
+                    url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code,
+                                 HTTPStatus.NOT_MODIFIED)
+                self.assertEqual(response.templates, [])
+                response = Client().get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_post_edit_and_comment_change_etag(self):
+        """Правка поста и новый комментарий меняют ETag страницы поста..........
+        """
+        etag = self.authorized_user.get(self.post_url)['ETag']
+        self.authorized_user.post(
+            reverse('post_edit', kwargs={'username': self.user.username,
+                                         'post_id': self.post.id}),
+            {'text': 'Исправленный пост', 'group': self.group.id})
+        response = self.authorized_user.get(self.post_url,
+                                            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        etag = response['ETag']
+        counters.add_comment(Comment(post=self.post, author=self.user,
+                                     text='Комментарий'))
+        response = self.authorized_user.get(self.post_url,
+                                            HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
@@ -0,0 +1,279 @@
+import json
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, wait
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from PIL import Image, ImageOps
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.parsers import parse_geometry
+
+logger = logging.getLogger(__name__)
+
+# размеры, которые выводят post_item.html и card_author.html
+POST_THUMBNAILS = (('960x339', {'crop': 'center', 'upscale': True}),)
+PHOTO_THUMBNAILS = (('240x180', {'crop': 'center', 'upscale': True}),)
+
+READY_KEY = 'thumbnail_ready:{}'
+VARIANTS_KEY = 'image_variants:{}'
+MANIFEST = 'manifest.json'
+
+# соотношение сторон карточки поста 960x339
+POST_RATIO = 339 / 960
+MIME_TYPES = {'AVIF': 'image/avif', 'WEBP': 'image/webp',
+              'JPEG': 'image/jpeg'}
+EXTENSIONS = {'AVIF': 'avif', 'WEBP': 'webp', 'JPEG': 'jpg'}
+
+_executor = None
+
+
+class Placeholder:
+    """Заглушка на месте миниатюры, которая ещё не готова."""
+    is_placeholder = True
+
+    def __init__(self, geometry):
+        self.width, self.height = parse_geometry(geometry)
+        self.url = settings.THUMBNAIL_PLACEHOLDER_URL
+
+
+class PregenerateBackend(ThumbnailBackend):
+    """
+    Бэкенд sorl, который умеет отдельно вычислить имя миниатюры и
+    отдельно её создать. Имена совпадают с тегом {% thumbnail %}.
+    """
+
+    def resolve(self, file_, geometry, storage=None, **options):
+        source = ImageFile(file_, storage)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry, options)
+        return source, ImageFile(name, storage or default.storage), options
+
+    def generate(self, file_, geometry, storage=None, **options):
+        source, thumbnail, options = self.resolve(file_, geometry, storage,
+                                                  **options)
+        if thumbnail.exists():
+            return thumbnail
+        source_image = default.engine.get_image(source)
+        try:
+            options['image_info'] = default.engine.get_image_info(
+                source_image)
+            source.set_size(default.engine.get_image_size(source_image))
+            self._create_thumbnail(source_image, geometry, options,
+                                   thumbnail)
+        finally:
+            default.engine.cleanup(source_image)
+        return thumbnail
+
+
+backend = PregenerateBackend()
+
+
+def ready_thumbnail(file_, geometry, **options):
+    """
+    Готовая миниатюра или заглушка. Ничего не декодирует: проверяет
+    наличие файла миниатюры и запоминает ответ в кеше.
+    """
+    if not file_:
+        return None
+    _, thumbnail, _ = backend.resolve(file_, geometry, **options)
+    key = READY_KEY.format(thumbnail.key)
+    if cache.get(key) or thumbnail.exists():
+        cache.set(key, True, None)
+        return thumbnail
+    return Placeholder(geometry)
+
+
+def variants_dir(name):
+    """
+    Каталог вариантов рядом с оригиналом: posts/cat.jpg ->
+    posts/cat.jpg.variants/. Расширение остаётся в имени, чтобы
+    posts/cat.jpg и posts/cat.png не делили один каталог.
+    """
+    return f'{name}.variants'
+
+
+def supported_formats():
+    """Форматы из IMAGE_VARIANT_FORMATS, которые умеет сохранять Pillow."""
+    Image.init()
+    return [format_ for format_ in settings.IMAGE_VARIANT_FORMATS
+            if format_ in Image.SAVE and format_ in MIME_TYPES]
+
+
+def make_variants(name, storage=None):
+    """
+    Сохраняет рядом с оригиналом обрезанные под карточку копии шириной
+    IMAGE_VARIANT_WIDTHS во всех поддерживаемых форматах. Ширины больше
+    исходной пропускаются. Список вариантов записывается в manifest.json
+    последним, поэтому его наличие означает, что всё готово.
+    """
+    storage = storage or default_storage
+    directory = variants_dir(name)
+    with storage.open(name) as original:
+        image = Image.open(original)
+        image = ImageOps.exif_transpose(image)
+        image.load()
+    widths = [width for width in settings.IMAGE_VARIANT_WIDTHS
+              if width <= image.width] or [
+        min(settings.IMAGE_VARIANT_WIDTHS)]
+    has_alpha = image.mode in ('RGBA', 'LA') or 'transparency' in image.info
+    sources = []
+    for format_ in supported_formats():
+        mode = 'RGBA' if has_alpha and format_ != 'JPEG' else 'RGB'
+        source = image.convert(mode)
+        files = []
+        for width in widths:
+            size = (width, max(round(width * POST_RATIO), 1))
+            variant = ImageOps.fit(source, size, Image.LANCZOS)
+            buffer = BytesIO()
+            variant.save(buffer, format_,
+                         quality=settings.IMAGE_VARIANT_QUALITY)
+            path = f'{directory}/{width}.{EXTENSIONS[format_]}'
+            storage.delete(path)
+            files.append([storage.save(path, ContentFile(buffer.getvalue())),
+                          width])
+        sources.append({'format': format_, 'files': files})
+    manifest = f'{directory}/{MANIFEST}'
+    storage.delete(manifest)
+    storage.save(manifest, ContentFile(json.dumps(sources).encode()))
+    # запомненное «вариантов нет» больше не верно
+    cache.delete(VARIANTS_KEY.format(name))
+    return sources
+
+
+def image_variants(file_):
+    """
+    Готовые варианты изображения для <picture> или None.
+
+    Возвращает словарь с источниками (тип и srcset) и запасной ссылкой
+    на JPEG. Манифест читается один раз и запоминается в кеше; его
+    отсутствие тоже запоминается, на IMAGE_VARIANT_MISS_TIMEOUT.
+    """
+    if not file_:
+        return None
+    key = VARIANTS_KEY.format(file_.name)
+    sources = cache.get(key)
+    if sources is None:
+        sources = _read_manifest(file_)
+        if sources is None:
+            cache.set(key, [], settings.IMAGE_VARIANT_MISS_TIMEOUT)
+            return None
+        cache.set(key, sources, None)
+    result = {'sources': [], 'fallback': None}
+    for source in sources:
+        srcset = ', '.join(f'{file_.storage.url(path)} {width}w'
+                           for path, width in source['files'])
+        result['sources'].append({'type': MIME_TYPES[source['format']],
+                                  'srcset': srcset})
+        if source['format'] == 'JPEG':
+            target = settings.IMAGE_VARIANT_FALLBACK_WIDTH
+            path, width = min(source['files'],
+                              key=lambda item: abs(item[1] - target))
+            result['fallback'] = file_.storage.url(path)
+            result['width'] = width
+            result['height'] = max(round(width * POST_RATIO), 1)
+    if result['fallback'] is None:
+        return None
+    return result
+
+
+def _read_manifest(file_):
+    manifest = f'{variants_dir(file_.name)}/{MANIFEST}'
+    try:
+        if not file_.storage.exists(manifest):
+            return None
+    except SuspiciousFileOperation:
+        # путь вне хранилища: вариантов для него не создаётся
+        return None
+    with file_.storage.open(manifest) as data:
+        return json.loads(data.read().decode())
+
+
+def _init_worker(settings_module):
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    django.setup()
+
+
+def _generate(name, sizes, location, variants=False):
+    storage = FileSystemStorage(location=location) if location else None
+    if variants:
+        try:
+            make_variants(name, storage)
+        except Exception:
+            logger.exception('Не удалось создать варианты %s', name)
+    for geometry, options in sizes:
+        try:
+            backend.generate(name, geometry, storage, **options)
+        except Exception:
+            logger.exception('Не удалось создать миниатюру %s %s',
+                             name, geometry)
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=settings.THUMBNAIL_WORKERS,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(os.environ.get('DJANGO_SETTINGS_MODULE',
+                                     'yatube.settings'),))
+    return _executor
+
+
+def enqueue(file_, sizes, variants=False, scopes=()):
+    """
+    Ставит миниатюры загруженного файла в очередь пула процессов.
+    С variants=True создаются и адаптивные варианты для <picture>.
+    Когда всё готово, поколения scopes сбрасываются: страницы,
+    закешированные с заглушкой, собираются заново.
+    """
+    if not file_ or not file_.storage.exists(file_.name):
+        return None
+    name = file_.name
+    location = (file_.storage.location
+                if isinstance(file_.storage, FileSystemStorage) else None)
+
+    def done(future=None):
+        # модуль грузится в процессах пула до django.setup(), поэтому
+        # поколения кеша, зависящие от моделей, импортируются здесь
+        from .cache import bump
+        cache.delete(VARIANTS_KEY.format(name))
+        if scopes:
+            bump(*scopes)
+
+    if not settings.THUMBNAIL_WORKERS:
+        _generate(name, sizes, location, variants)
+        done()
+        return None
+    future = _get_executor().submit(_generate, name, sizes, location,
+                                    variants)
+    future.add_done_callback(done)
+    return future
+
+
+def pregenerate(files):
+    """
+    Создаёт миниатюры для четвёрок (файл, размеры, нужны ли варианты,
+    области кеша) и ждёт окончания.
+    """
+    futures = [enqueue(file_, sizes, variants, scopes)
+               for file_, sizes, variants, scopes in files]
+    wait([future for future in futures if future is not None])
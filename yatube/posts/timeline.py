@@ -0,0 +1,95 @@
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+
+from .models import FeedEntry, Follow, Post, Profile
+from .paginator import MergedFeed
+
+ORDERING = ('-feed_pub_date', '-feed_post_id')
+
+
+def is_pull_author(author_id):
+    """
+    Авторов с большим числом подписчиков или записей не рассылаем
+    по лентам: их посты подмешиваются при чтении. Отметка остаётся,
+    пока ленты не пересоберут командой rebuild_feeds.
+    """
+    return Profile.objects.filter(user_id=author_id).filter(
+        Q(feed_pull=True)
+        | Q(followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        | Q(posts_count__gt=settings.FEED_BACKFILL_MAX_POSTS)).exists()
+
+
+def mark_pull_author(author_id):
+    Profile.objects.filter(user_id=author_id).update(feed_pull=True)
+
+
+def fan_out(post):
+    """Рассылает новый пост по лентам подписчиков автора."""
+    if is_pull_author(post.author_id):
+        mark_pull_author(post.author_id)
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        batch_size=500, ignore_conflicts=True)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту посты автора, на которого подписались."""
+    if is_pull_author(author_id):
+        mark_pull_author(author_id)
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list(
+        'pk', 'pub_date')
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id, pub_date=pub_date)
+         for post_id, pub_date in posts.iterator()),
+        batch_size=500, ignore_conflicts=True)
+
+
+def prune(user_id, author_id):
+    FeedEntry.objects.filter(user_id=user_id,
+                             post__author_id=author_id).delete()
+
+
+def follow_feed(user):
+    """
+    Лента подписок: диапазон по индексу (user, pub_date) материализованной
+    ленты плюс посты «тянущихся» авторов, слитые по тому же ключу.
+    """
+    pull_authors = list(Follow.objects.filter(
+        user=user, author__profile__feed_pull=True).values_list(
+        'author_id', flat=True))
+    entries = Post.objects.feed().filter(feed_entries__user=user).annotate(
+        feed_pub_date=F('feed_entries__pub_date'),
+        feed_post_id=F('feed_entries__post_id'))
+    if not pull_authors:
+        return entries
+    pulled = Post.objects.feed().filter(author_id__in=pull_authors).annotate(
+        feed_pub_date=F('pub_date'), feed_post_id=F('pk'))
+    return MergedFeed(entries.exclude(author_id__in=pull_authors), pulled)
+
+
+def rebuild_feeds():
+    """
+    Пересобирает материализованные ленты всех пользователей:
+    сначала заново отмечает «тянущихся» авторов, затем раскладывает
+    посты остальных одним INSERT ... SELECT прямо в базе.
+    """
+    FeedEntry.objects.all().delete()
+    Profile.objects.update(feed_pull=False)
+    Profile.objects.filter(
+        Q(followers_count__gt=settings.FEED_FANOUT_MAX_FOLLOWERS)
+        | Q(posts_count__gt=settings.FEED_BACKFILL_MAX_POSTS)).update(
+        feed_pull=True)
+    rows = Follow.objects.exclude(author__profile__feed_pull=True).filter(
+        author__posts__isnull=False).values_list(
+        'user_id', 'author__posts__id', 'author__posts__pub_date')
+    sql, params = rows.query.sql_with_params()
+    table = FeedEntry._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {table} (user_id, post_id, pub_date) {sql}', params)
@@ -0,0 +1,278 @@
+"""
+Перенос данных между базами в NDJSON и CSV.
+
+Записи ссылаются друг на друга естественными ключами: пользователи —
+по username, группы — по slug; посты и комментарии сохраняют свои id.
+Записи, уже загруженные прошлым запуском, пропускаются; если id занят
+другой записью, импорт останавливается, а не теряет её молча.
+Экспорт и импорт идут потоком: в памяти не больше одной пачки строк.
+"""
+import csv
+import json
+import os
+from itertools import groupby
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Comment, Follow, Group, Post, User
+
+# порядок важен: каждая модель ссылается только на предыдущие
+FIELDS = {
+    'users': ('username', 'email', 'first_name', 'last_name', 'password',
+              'is_active', 'date_joined'),
+    'groups': ('slug', 'title', 'description'),
+    'posts': ('id', 'author', 'group', 'text', 'pub_date', 'updated',
+              'image'),
+    'comments': ('id', 'post', 'author', 'text', 'created'),
+    'follows': ('user', 'author'),
+}
+MODELS = tuple(FIELDS)
+
+
+class TransferError(ValueError):
+    """Запись, которую нельзя импортировать."""
+
+
+def _querysets():
+    return {
+        'users': User.objects.order_by('pk').values_list(
+            'username', 'email', 'first_name', 'last_name', 'password',
+            'is_active', 'date_joined'),
+        'groups': Group.objects.order_by('pk').values_list(
+            'slug', 'title', 'description'),
+        'posts': Post.objects.order_by('pk').values_list(
+            'id', 'author__username', 'group__slug', 'text', 'pub_date',
+            'updated', 'image'),
+        'comments': Comment.objects.order_by('pk').values_list(
+            'id', 'post_id', 'author__username', 'text', 'created'),
+        'follows': Follow.objects.order_by('pk').values_list(
+            'user__username', 'author__username'),
+    }
+
+
+def _dump(value):
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def export_records(models=MODELS, chunk_size=1000):
+    """Пары (модель, словарь полей) в порядке зависимостей."""
+    querysets = _querysets()
+    for model in MODELS:
+        if model not in models:
+            continue
+        for row in querysets[model].iterator(chunk_size=chunk_size):
+            yield model, dict(zip(FIELDS[model],
+                                  (_dump(value) for value in row)))
+
+
+def write_ndjson(records, stream):
+    total = 0
+    for model, record in records:
+        stream.write(json.dumps({'model': model, **record},
+                                ensure_ascii=False) + '\n')
+        total += 1
+    return total
+
+
+def write_csv(records, directory):
+    """Пишет по файлу <модель>.csv на каждую модель в каталог."""
+    os.makedirs(directory, exist_ok=True)
+    total = 0
+    for model, rows in groupby(records, key=lambda item: item[0]):
+        path = os.path.join(directory, f'{model}.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as output:
+            writer = csv.DictWriter(output, FIELDS[model])
+            writer.writeheader()
+            for _, record in rows:
+                writer.writerow(record)
+                total += 1
+    return total
+
+
+def read_ndjson(path):
+    with open(path, encoding='utf-8') as source:
+        for number, line in enumerate(source, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError as error:
+                raise TransferError(f'строка {number}: {error}')
+            model = record.pop('model', None)
+            if model not in FIELDS:
+                raise TransferError(
+                    f'строка {number}: неизвестная модель {model!r}')
+            yield model, record
+
+
+def read_csv(directory):
+    for model in MODELS:
+        path = os.path.join(directory, f'{model}.csv')
+        if not os.path.exists(path):
+            continue
+        with open(path, newline='', encoding='utf-8') as source:
+            for record in csv.DictReader(source):
+                yield model, record
+
+
+def _date(value):
+    if not value:
+        return timezone.now()
+    if not isinstance(value, str):
+        return value
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise TransferError(f'неверная дата {value!r}')
+    if settings.USE_TZ and timezone.is_naive(parsed):
+        return timezone.make_aware(parsed)
+    if not settings.USE_TZ and timezone.is_aware(parsed):
+        return timezone.make_naive(parsed)
+    return parsed
+
+
+def _bool(value):
+    if isinstance(value, str):
+        return value.strip().lower() not in ('', '0', 'false', 'no')
+    return bool(value)
+
+
+def _lookup(model, field, values):
+    """Словарь значение ключа -> pk для ключей одной пачки."""
+    values = {value for value in values if value}
+    found = dict(model.objects.filter(**{f'{field}__in': values}
+                                      ).values_list(field, 'pk'))
+    missing = values - set(found)
+    if missing:
+        raise TransferError(
+            f'не найдены {model._meta.verbose_name_plural}: '
+            f'{", ".join(sorted(map(str, missing))[:5])}')
+    return found
+
+
+def _new(model, objects, key, fields=(), label=None):
+    """
+    Объекты без уже загруженных: запись с тем же ключом и теми же
+    полями fields пропускается, с другими — это чужая запись.
+    """
+    existing = {
+        row[0]: row[1:] for row in model.objects.filter(**{
+            f'{key}__in': [getattr(obj, key) for obj in objects]
+        }).values_list(key, *fields)}
+    new = []
+    for obj in objects:
+        value = getattr(obj, key)
+        if value not in existing:
+            new.append(obj)
+        elif existing[value] != tuple(getattr(obj, field)
+                                      for field in fields):
+            raise TransferError(
+                f'{label or model._meta.verbose_name} с {key} {value} '
+                'уже есть в базе и не совпадает с импортируемой записью')
+    return new
+
+
+def _users(records):
+    unusable = make_password(None)
+    users = [User(username=record['username'],
+                  email=record.get('email') or '',
+                  first_name=record.get('first_name') or '',
+                  last_name=record.get('last_name') or '',
+                  password=record.get('password') or unusable,
+                  is_active=_bool(record.get('is_active', True)),
+                  date_joined=_date(record.get('date_joined')))
+             for record in records]
+    return _new(User, users, 'username')
+
+
+def _groups(records):
+    groups = [Group(slug=record['slug'], title=record['title'],
+                    description=record.get('description') or '')
+              for record in records]
+    return _new(Group, groups, 'slug')
+
+
+def _posts(records):
+    authors = _lookup(User, 'username',
+                      (record['author'] for record in records))
+    groups = _lookup(Group, 'slug',
+                     (record.get('group') for record in records))
+    posts = []
+    for record in records:
+        pub_date = _date(record.get('pub_date'))
+        posts.append(Post(
+            id=int(record['id']), author_id=authors[record['author']],
+            group_id=groups.get(record.get('group')), text=record['text'],
+            pub_date=pub_date,
+            updated=_date(record.get('updated') or pub_date),
+            image=record.get('image') or None))
+    return _new(Post, posts, 'id', ('author_id', 'text'))
+
+
+def _comments(records):
+    authors = _lookup(User, 'username',
+                      (record['author'] for record in records))
+    _lookup(Post, 'pk', (int(record['post']) for record in records))
+    comments = [Comment(id=int(record['id']), post_id=int(record['post']),
+                        author_id=authors[record['author']],
+                        text=record['text'],
+                        created=_date(record.get('created')))
+                for record in records]
+    return _new(Comment, comments, 'id', ('post_id', 'author_id', 'text'),
+                label='Комментарий')
+
+
+def _follows(records):
+    users = _lookup(User, 'username', (
+        name for record in records
+        for name in (record['user'], record['author'])))
+    existing = set(Follow.objects.filter(
+        user_id__in=[users[record['user']] for record in records]
+    ).values_list('user_id', 'author_id'))
+    follows = {}
+    for record in records:
+        pair = users[record['user']], users[record['author']]
+        if pair[0] != pair[1] and pair not in existing:
+            follows[pair] = Follow(user_id=pair[0], author_id=pair[1])
+    return list(follows.values())
+
+
+BUILDERS = {
+    'users': (User, _users),
+    'groups': (Group, _groups),
+    'posts': (Post, _posts),
+    'comments': (Comment, _comments),
+    'follows': (Follow, _follows),
+}
+
+
+def batches(records, batch_size):
+    """
+    Пачки (модель, записи) не длиннее batch_size: пачка обрывается и
+    на смене модели, чтобы ключи предыдущей модели уже были в базе.
+    """
+    batch = []
+    current = None
+    for model, record in records:
+        if batch and (model != current or len(batch) >= batch_size):
+            yield current, batch
+            batch = []
+        current = model
+        batch.append(record)
+    if batch:
+        yield current, batch
+
+
+def build(model, records):
+    """Несохранённые объекты модели для пачки записей."""
+    model_class, builder = BUILDERS[model]
+    try:
+        return model_class, builder(records)
+    except TransferError:
+        raise
+    except (KeyError, TypeError, ValueError) as error:
+        raise TransferError(f'{model}: нет или неверно поле {error}')
@@ -0,0 +1,199 @@
+import os
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import InMemoryUploadedFile, UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+from PIL import Image, ImageOps, ImageSequence
+
+# форматы, которые сохраняются как есть; остальные перекодируются в JPEG
+KEEP_FORMATS = ('JPEG', 'PNG', 'GIF', 'WEBP')
+# форматы, в которых анимация сохраняется; у других остаётся первый кадр
+ANIMATED_FORMATS = ('PNG', 'GIF', 'WEBP')
+HEADER_LIMIT = 64 * 1024
+
+TOO_LARGE = 'Файл изображения слишком большой'
+TOO_MANY_PIXELS = 'Слишком большое разрешение изображения'
+TOO_MANY_FRAMES = 'Слишком много кадров в анимации'
+
+
+def _open_checked(data):
+    """
+    Открывает изображение по заголовку, не декодируя пиксели.
+    Бросает ValueError, если картинка больше IMAGE_UPLOAD_MAX_PIXELS.
+    """
+    with warnings.catch_warnings():
+        warnings.simplefilter('error', Image.DecompressionBombWarning)
+        try:
+            image = Image.open(data)
+        except (Image.DecompressionBombError,
+                Image.DecompressionBombWarning):
+            raise ValueError(TOO_MANY_PIXELS)
+    if image.width * image.height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValueError(TOO_MANY_PIXELS)
+    return image
+
+
+class RejectedUpload(UploadedFile):
+    """Загрузка, отброшенная ImageUploadHandler, с причиной отказа."""
+
+    def __init__(self, name, error):
+        super().__init__(BytesIO(), name=name, size=0)
+        self.error = error
+
+
+class ImageUploadHandler(FileUploadHandler):
+    """
+    Первый обработчик загрузок: считает байты и читает заголовок
+    изображения из первых фрагментов. Слишком большие файлы и
+    «бомбы распаковки» отбрасываются до того, как остальные
+    обработчики запишут их в память или во временный файл.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.header = b''
+        self.error = None
+
+    def receive_data_chunk(self, raw_data, start):
+        if self.error:
+            return None
+        self.received += len(raw_data)
+        if self.received > settings.IMAGE_UPLOAD_MAX_BYTES:
+            self.error = TOO_LARGE
+            return None
+        if self.header is not None:
+            self.header += raw_data
+            try:
+                _open_checked(BytesIO(self.header))
+            except ValueError as error:
+                self.error = str(error)
+                return None
+            except (OSError, SyntaxError):
+                # заголовок ещё не пришёл целиком или это не картинка
+                if len(self.header) < HEADER_LIMIT:
+                    return raw_data
+            self.header = None
+        return raw_data
+
+    def file_complete(self, file_size):
+        if self.error:
+            return RejectedUpload(self.file_name, self.error)
+        return None
+
+
+class NormalizedImagesMixin:
+    """
+    Примесь формы, которая приводит загрузки полей normalized_images
+    к единому виду: поворачивает по EXIF и удаляет его, уменьшает до
+    IMAGE_UPLOAD_MAX_SIZE и перекодирует с качеством
+    IMAGE_UPLOAD_QUALITY. Сами поля остаются обычными ImageField,
+    а размеры и вес результата попадают в поля модели.
+    """
+    normalized_images = ()
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rejected = {}
+        for name in self.normalized_images:
+            upload = self.files.get(name)
+            if isinstance(upload, RejectedUpload):
+                # отброшенный файл не должен дойти до ImageField
+                self.rejected[name] = upload.error
+                self.files = self.files.copy()
+                self.files.pop(name)
+
+    def clean_normalized(self, name):
+        """Вызывается из clean_<name> формы."""
+        if name in self.rejected:
+            raise forms.ValidationError(self.rejected[name],
+                                        code='invalid_image')
+        value = self.cleaned_data[name]
+        if isinstance(value, UploadedFile):
+            try:
+                value = normalize(value)
+            except ValueError as error:
+                raise forms.ValidationError(str(error), code='invalid_image')
+        record_metadata(self.instance, name, value)
+        return value
+
+
+def _frames(image):
+    """
+    Кадры анимации, повёрнутые по EXIF и уменьшенные до
+    IMAGE_UPLOAD_MAX_SIZE, и параметры сохранения всей анимации.
+    Бросает ValueError, если все кадры вместе больше
+    IMAGE_UPLOAD_MAX_PIXELS: каждый кадр декодируется целиком.
+    """
+    # n_frames читает только заголовки кадров
+    if (image.n_frames * image.width * image.height
+            > settings.IMAGE_UPLOAD_MAX_PIXELS):
+        raise ValueError(TOO_MANY_FRAMES)
+    frames = []
+    durations = []
+    for frame in ImageSequence.Iterator(image):
+        durations.append(frame.info.get('duration', 100))
+        frame = ImageOps.exif_transpose(frame.convert('RGBA'))
+        frame.thumbnail(settings.IMAGE_UPLOAD_MAX_SIZE, Image.LANCZOS)
+        frames.append(frame)
+    options = {'save_all': True, 'append_images': frames[1:],
+               'duration': durations, 'loop': image.info.get('loop', 0)}
+    if image.format == 'GIF':
+        # кадры собраны целиком, прежний кадр не должен просвечивать
+        options['disposal'] = 2
+    elif image.format == 'WEBP':
+        options['quality'] = settings.IMAGE_UPLOAD_QUALITY
+    return frames[0], options
+
+
+def normalize(upload):
+    upload.seek(0)
+    image = _open_checked(upload)
+    format_ = image.format if image.format in KEEP_FORMATS else 'JPEG'
+    name = upload.name
+    if format_ != image.format:
+        name = f'{os.path.splitext(name)[0]}.jpg'
+    if format_ in ANIMATED_FORMATS and getattr(image, 'is_animated', False):
+        # каждый кадр уменьшается и теряет EXIF так же, как картинка
+        image, options = _frames(image)
+        buffer = BytesIO()
+        image.save(buffer, format_, **options)
+        content = buffer.getvalue()
+    else:
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail(settings.IMAGE_UPLOAD_MAX_SIZE, Image.LANCZOS)
+        options = {'optimize': True}
+        if 'icc_profile' in image.info:
+            options['icc_profile'] = image.info['icc_profile']
+        if 'transparency' in image.info:
+            options['transparency'] = image.info['transparency']
+        if format_ in ('JPEG', 'WEBP'):
+            options['quality'] = settings.IMAGE_UPLOAD_QUALITY
+        if format_ == 'JPEG' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+            options.pop('transparency', None)
+        buffer = BytesIO()
+        image.save(buffer, format_, **options)
+        content = buffer.getvalue()
+    result = InMemoryUploadedFile(BytesIO(content), None, name,
+                                  Image.MIME[format_], len(content), None)
+    result.width, result.height = image.size
+    return result
+
+
+def record_metadata(instance, field, value):
+    """
+    Переносит размеры и вес нормализованной загрузки в поля модели
+    <field>_width, <field>_height и <field>_size.
+    """
+    if value is False:
+        values = (None, None, None)
+    elif isinstance(value, UploadedFile) and hasattr(value, 'width'):
+        values = (value.width, value.height, value.size)
+    else:
+        return
+    for suffix, item in zip(('width', 'height', 'size'), values):
+        setattr(instance, f'{field}_{suffix}', item)
@@ -11,12 +11,17 @@ urlpatterns = [
     path('new/', views.new_post, name='new_post'),
 
     path('follow/', views.follow_index, name='follow_index'),
+    path('discussed/', views.discussed, name='discussed'),
+    path('search/', views.search_posts, name='search'),
     path('<str:username>/', views.profile, name='profile'),
+    path('<str:username>/all/', views.profile_all, name='profile_all'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/', views.post_edit,
          name='post_edit'),
     path('<str:username>/<int:post_id>/comment/', views.add_comment,
          name='add_comment'),
+    path('<str:username>/<int:post_id>/comments/', views.post_comments,
+         name='post_comments'),
     path('<str:username>/follow/', views.profile_follow,
          name='profile_follow'),
     path('<str:username>/unfollow/', views.profile_unfollow,
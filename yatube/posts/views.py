@@ -2,59 +2,138 @@ from http import HTTPStatus
 
 from django.conf import settings
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
 
+from . import counters, search, timeline
+from .cache import cache_feed, get_version
+from .cards import STREAM_MARKER, stream_cards
+from .conditional import (conditional, group_validators, post_validators,
+                          profile_validators, scope_validators)
 from .forms import CommentForm, UserEditForm, PostForm, ProfileEditForm
-from .models import Comment, Follow, Group, Post, User, Profile
+from .models import (DISCUSSED_ORDERING, Comment, Follow, Group, Post, User,
+                     Profile)
+from .paginator import KeysetPaginator, paginate
 
 
-@cache_page(20, key_prefix='index_page')
+@conditional(lambda request: scope_validators('index'))
+@cache_feed(settings.FEED_CACHE_TIMEOUT, key_prefix='index_page')
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed()
+    page = paginate(request, post_list)
     return render(request, 'posts/index.html', {
-        'page': page, 'paginator': paginator})
+        'page': page, 'paginator': page.paginator,
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': get_version('index')})
 
 
+@conditional(lambda request: scope_validators('index'))
+@cache_feed(settings.FEED_CACHE_TIMEOUT, key_prefix='discussed_page')
+def discussed(request):
+    """Самые обсуждаемые посты: сортировка по столбцу comment_count."""
+    page = paginate(request, Post.objects.feed(),
+                    ordering=DISCUSSED_ORDERING)
+    return render(request, 'posts/discussed.html', {
+        'page': page, 'paginator': page.paginator,
+        'cache_timeout': settings.FEED_CACHE_TIMEOUT,
+        'feed_version': get_version('index')})
+
+
+@conditional(group_validators)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = Post.objects.feed().filter(group=group)
+    page = paginate(request, post_list)
     return render(request, 'posts/group.html', {
-        'group': group, 'page': page, 'paginator': paginator})
+        'group': group, 'page': page, 'paginator': page.paginator})
+
 
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    page = search.search(query, request.GET.get('page'))
+    return render(request, 'posts/search.html', {
+        'query': query, 'page': page, 'paginator': page.paginator})
 
+
+@conditional(profile_validators)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    profile_data = get_object_or_404(Profile, user=author)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    profile_data = get_object_or_404(Profile.objects.select_related('user'),
+                                     user__username=username)
+    author = profile_data.user
+    post_list = Post.objects.feed().filter(author=author)
+    page = paginate(request, post_list)
     following = request.user.is_authenticated and (
         Follow.objects.filter(user=request.user, author=author).exists())
     return render(request, 'posts/profile.html', {
         'author': author, 'following': following,
-        'page': page, 'paginator': paginator, 'profile': True,
+        'page': page, 'paginator': page.paginator, 'profile': True,
         'data': profile_data})
 
 
+def profile_all(request, username):
+    """
+    Все посты автора одной страницей. Шапка уходит клиенту сразу,
+    карточки рендерятся пачками, пока курсор читает посты, поэтому
+    память не растёт с числом постов автора.
+    """
+    profile_data = get_object_or_404(Profile.objects.select_related('user'),
+                                     user__username=username)
+    author = profile_data.user
+    following = request.user.is_authenticated and (
+        Follow.objects.filter(user=request.user, author=author).exists())
+    head, tail = render_to_string('posts/profile_all.html', {
+        'author': author, 'following': following, 'profile': True,
+        'data': profile_data}, request).split(STREAM_MARKER)
+    posts = Post.objects.feed().filter(author=author).order_by(
+        '-pub_date', '-pk').iterator(chunk_size=settings.STREAM_CHUNK_SIZE)
+    user = request.user
+
+    def content():
+        yield head
+        yield from stream_cards(posts, user, settings.STREAM_CHUNK_SIZE)
+        yield tail
+
+    return StreamingHttpResponse(content())
+
+
+@conditional(post_validators)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post.objects.select_related('author'),
-                             id=post_id, author__username=username)
-    comments = post.post_comments.all()
+    post = get_object_or_404(
+        Post.objects.feed().select_related('author__profile'),
+        id=post_id, author__username=username)
     form = CommentForm()
+    try:
+        data = post.author.profile
+    except Profile.DoesNotExist:
+        # пользователи из фикстур могут быть без профиля
+        data = None
     return render(request, 'posts/post.html', {
         'author': post.author,
+        'data': data,
         'post': post,
         'form': form,
-        'comments': comments})
+        'comments': comments_page(request, post)})
+
+
+def comments_page(request, post):
+    """
+    Страница комментариев поста: авторы подтягиваются тем же запросом,
+    следующая порция грузится по курсору кнопкой «Показать ещё».
+    """
+    comments = post.post_comments.select_related('author')
+    paginator = KeysetPaginator(comments, settings.COMMENTS_PAGE_SIZE,
+                                ordering=('-created', '-pk'),
+                                approximate=True, lookahead=2)
+    return paginator.get_page(request.GET.get('page'),
+                              cursor=request.GET.get('cursor'))
+
+
+def post_comments(request, username, post_id):
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
+    return render(request, 'posts/comment_list.html', {
+        'post': post, 'comments': comments_page(request, post)})
 
 
 @login_required
@@ -65,7 +144,7 @@ def new_post(request):
                       {'form': form, 'mode': 'create'})
     post = form.save(commit=False)
     post.author = request.user
-    post.save()
+    counters.publish_post(post)
     return redirect('index')
 
 
@@ -78,7 +157,7 @@ def post_edit(request, username, post_id):
     form = PostForm(request.POST or None, files=request.FILES or None,
                     instance=post_object)
     if form.is_valid():
-        form.save()
+        counters.edit_post(form.save(commit=False))
         return redirect('post', username=username, post_id=post_id)
     return render(request, 'posts/new_post.html', {
         'form': form, 'mode': 'edit', 'post': post_object})
@@ -96,30 +175,28 @@ def page500(request):
 
 @login_required
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, id=post_id, author__username=username)
-    comments = post.post_comments.all()
+    post = get_object_or_404(Post.objects.select_related('author'),
+                             id=post_id, author__username=username)
     form = CommentForm(request.POST or None)
     if form.is_valid():
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        counters.add_comment(comment)
         return redirect('post', username=username, post_id=post_id)
     return render(request, 'posts/comments.html', {
         'form': form,
         'post': post,
         'author': post.author,
-        'comments': comments})
+        'comments': comments_page(request, post)})
 
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, settings.PAGINATOR_COUNT)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post_list = timeline.follow_feed(request.user)
+    page = paginate(request, post_list, ordering=timeline.ORDERING)
     return render(request, 'posts/follow.html', {
-        'page': page, 'paginator': paginator})
+        'page': page, 'paginator': page.paginator})
 
 
 @login_required
@@ -127,7 +204,7 @@ def profile_follow(request, username):
     follower = request.user
     following = get_object_or_404(User, username=username)
     if follower != following:
-        Follow.objects.get_or_create(user=follower, author=following)
+        counters.follow(follower, following)
     return redirect('profile', username=username)
 
 
@@ -135,7 +212,7 @@ def profile_follow(request, username):
 def profile_unfollow(request, username):
     follower = request.user
     following = get_object_or_404(User, username=username)
-    Follow.objects.filter(user=follower, author=following).delete()
+    counters.unfollow(follower, following)
     return redirect('profile', username=username)
 
 
@@ -143,7 +220,7 @@ def profile_unfollow(request, username):
 def comment_delete(request, id):
     comment = get_object_or_404(Comment, id=id)
     if request.user == comment.author or request.user == comment.post.author:
-        comment.delete()
+        counters.delete_comment(comment)
     return redirect('post', username=comment.post.author,
                     post_id=comment.post.id)
 
@@ -152,7 +229,7 @@ def comment_delete(request, id):
 def post_delete(request, id):
     post = get_object_or_404(Post, id=id)
     if request.user == post.author:
-        post.delete()
+        counters.delete_post(post)
     return redirect('profile', username=post.author)
 
 
@@ -0,0 +1,23 @@
+from django import template
+
+from posts.cards import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """
+    Карточки ленты из кеша карточек:
+
+        {% post_cards page %}
+
+    Кнопка правки подставляется для постов текущего пользователя.
+    """
+    return render_cards(posts, context.get('user'))
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post):
+    """Карточка на странице самого поста: {% post_card post %}."""
+    return render_cards([post], context.get('user'), detail=True)
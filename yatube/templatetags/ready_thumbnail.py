@@ -0,0 +1,30 @@
+from django import template
+
+from posts import thumbnails
+
+register = template.Library()
+
+
+@register.simple_tag
+def ready_thumbnail(file_, geometry, **options):
+    """
+    Неблокирующая замена {% thumbnail %}:
+
+        {% ready_thumbnail post.image "960x339" crop="center" as im %}
+
+    Возвращает готовую миниатюру или заглушку того же размера,
+    если пул процессов её ещё не создал.
+    """
+    return thumbnails.ready_thumbnail(file_, geometry, **options)
+
+
+@register.simple_tag
+def image_variants(file_):
+    """
+    Варианты изображения поста для <picture>:
+
+        {% image_variants post.image as variants %}
+
+    Пока варианты не созданы, возвращает None.
+    """
+    return thumbnails.image_variants(file_)
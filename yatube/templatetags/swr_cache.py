@@ -0,0 +1,52 @@
+from django import template
+from django.core.cache.utils import make_template_fragment_key
+
+from posts import stampede
+
+register = template.Library()
+
+
+class SWRCacheNode(template.Node):
+    def __init__(self, nodelist, expire_time, fragment_name, vary_on,
+                 version):
+        self.nodelist = nodelist
+        self.expire_time = expire_time
+        self.fragment_name = fragment_name
+        self.vary_on = vary_on
+        self.version = version
+
+    def render(self, context):
+        try:
+            expire_time = int(self.expire_time.resolve(context))
+        except (template.VariableDoesNotExist, TypeError, ValueError):
+            raise template.TemplateSyntaxError(
+                '"swr_cache" tag got a non-integer timeout value')
+        vary_on = [var.resolve(context) for var in self.vary_on]
+        version = self.version.resolve(context) if self.version else None
+        key = make_template_fragment_key(self.fragment_name, vary_on)
+        return stampede.get_or_set(
+            key, lambda: self.nodelist.render(context), expire_time, version)
+
+
+@register.tag('swr_cache')
+def do_swr_cache(parser, token):
+    """
+    Замена {% cache %} с защитой от лавины пересчётов:
+
+        {% swr_cache timeout name [vary_on ...] [version=var] %}
+
+    Смена version делает фрагмент устаревшим, но не удаляет его:
+    пока один процесс пересчитывает фрагмент, остальные отдают прежний.
+    """
+    nodelist = parser.parse(('endswr_cache',))
+    parser.delete_first_token()
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError(
+            f'"{bits[0]}" tag requires at least 2 arguments.')
+    version = None
+    if bits[-1].startswith('version='):
+        version = parser.compile_filter(bits.pop()[len('version='):])
+    return SWRCacheNode(
+        nodelist, parser.compile_filter(bits[1]), bits[2],
+        [parser.compile_filter(bit) for bit in bits[3:]], version)
@@ -0,0 +1,359 @@
+"""
+Общий кеш для всех процессов.
+
+CACHE_URL выбирает хранилище: sqlite:///путь (по умолчанию, общий для
+процессов одной машины), file:///каталог, redis://хост:порт/база или
+memcached://хост:порт, если установлен клиент, и locmem:// для
+отладки. Поверх любого из них CompactCache хранит значения компактно:
+pickle последнего протокола, а крупные — отрендеренные страницы и
+фрагменты — ещё и сжатыми zlib. SQLiteCache под ним пишет эти байты
+как есть, без второго pickle. cache_usage() считает занятое место
+по префиксам ключей (команда cache_usage).
+"""
+import os
+import pickle
+import random
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from importlib.util import find_spec
+from urllib.parse import unquote, urlsplit
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+from django.utils.module_loading import import_string
+
+RAW = b'\x00'
+COMPRESSED = b'\x01'
+LIVE = '(expires IS NULL OR expires > ?)'
+
+# ключи страниц и фрагментов Django группируются по своему префиксу
+PAGE_KEY = re.compile(r'^views\.decorators\.cache\.cache_(page|header)\.'
+                      r'([^.]*)\.')
+FRAGMENT_KEY = re.compile(r'^template\.cache\.([^.]*)\.')
+
+
+def cache_config(url, compress_min_bytes=1024, max_entries=100000):
+    """Словарь для settings.CACHES по адресу кеша."""
+    parts = urlsplit(url)
+    path = unquote(parts.path)
+    options = {'MAX_ENTRIES': max_entries}
+    if parts.scheme == 'locmem':
+        backend, location = ('django.core.cache.backends.locmem.'
+                             'LocMemCache'), parts.netloc
+    elif parts.scheme == 'sqlite':
+        # sqlite:///relative.db и sqlite:////absolute/path.db
+        backend, location = 'yatube.caches.SQLiteCache', path[1:]
+        # CompactCache отдаёт ему уже байты и целые числа
+        options['RAW_VALUES'] = True
+    elif parts.scheme == 'file':
+        backend, location = ('django.core.cache.backends.filebased.'
+                             'FileBasedCache'), path
+    elif parts.scheme == 'redis':
+        if find_spec('django_redis') is None:
+            raise ImproperlyConfigured('redis:// требует django-redis')
+        backend, location = 'django_redis.cache.RedisCache', url
+    elif parts.scheme == 'memcached':
+        if find_spec('pylibmc') is not None:
+            backend = 'django.core.cache.backends.memcached.PyLibMCCache'
+        elif find_spec('memcache') is not None:
+            backend = 'django.core.cache.backends.memcached.MemcachedCache'
+        else:
+            raise ImproperlyConfigured(
+                'memcached:// требует pylibmc или python-memcached')
+        location, options = parts.netloc, {}
+    else:
+        raise ImproperlyConfigured(f'Неизвестный кеш в CACHE_URL: {url}')
+    return {
+        'BACKEND': 'yatube.caches.CompactCache',
+        'LOCATION': location,
+        'OPTIONS': {'BACKEND': backend, 'OPTIONS': options,
+                    'COMPRESS_MIN_BYTES': compress_min_bytes},
+    }
+
+
+def key_prefix(key):
+    """
+    Префикс для отчёта: ':1:feed_version:index' -> 'feed_version',
+    страница index_page -> 'page:index_page', фрагмент -> 'fragment:имя'.
+    """
+    key = key.split(':', 2)[-1]
+    match = PAGE_KEY.match(key)
+    if match:
+        return f'{match.group(1)}:{match.group(2)}'
+    match = FRAGMENT_KEY.match(key)
+    if match:
+        return f'fragment:{match.group(1)}'
+    if key.endswith(':lock'):
+        return 'lock'
+    return re.split(r':|\|\|', key, 1)[0]
+
+
+class CompactCache(BaseCache):
+    """
+    Обёртка над бэкендом из OPTIONS['BACKEND']: ключи и сроки
+    обрабатывает он сам, а значения приходят к нему уже байтами.
+    Целые числа не кодируются, чтобы incr оставался атомарным.
+    """
+
+    def __init__(self, location, params):
+        options = params.get('OPTIONS', {})
+        super().__init__({**params, 'OPTIONS': {}})
+        self.compress_min_bytes = options.get('COMPRESS_MIN_BYTES', 1024)
+        self.backend = import_string(options['BACKEND'])(
+            location, {**params, 'OPTIONS': options.get('OPTIONS', {})})
+
+    def encode(self, value):
+        if type(value) is int:
+            return value
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        if len(data) >= self.compress_min_bytes:
+            return COMPRESSED + zlib.compress(data)
+        return RAW + data
+
+    def decode(self, value):
+        if not isinstance(value, bytes):
+            return value
+        if value[:1] == COMPRESSED:
+            return pickle.loads(zlib.decompress(value[1:]))
+        return pickle.loads(value[1:])
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.add(key, self.encode(value), timeout, version)
+
+    def get(self, key, default=None, version=None):
+        value = self.backend.get(key, version=version)
+        return default if value is None else self.decode(value)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.backend.set(key, self.encode(value), timeout, version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.touch(key, timeout, version)
+
+    def delete(self, key, version=None):
+        return self.backend.delete(key, version)
+
+    def get_many(self, keys, version=None):
+        return {key: self.decode(value) for key, value in
+                self.backend.get_many(keys, version).items()}
+
+    def has_key(self, key, version=None):
+        return self.backend.has_key(key, version)
+
+    def incr(self, key, delta=1, version=None):
+        return self.backend.incr(key, delta, version)
+
+    def decr(self, key, delta=1, version=None):
+        return self.backend.decr(key, delta, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.backend.set_many(
+            {key: self.encode(value) for key, value in data.items()},
+            timeout, version)
+
+    def delete_many(self, keys, version=None):
+        return self.backend.delete_many(keys, version)
+
+    def clear(self):
+        return self.backend.clear()
+
+    def close(self, **kwargs):
+        return self.backend.close(**kwargs)
+
+
+class SQLiteCache(BaseCache):
+    """
+    Кеш в файле SQLite: общий для процессов одной машины и переживает
+    их перезапуск. WAL позволяет читать, не дожидаясь записи, add
+    атомарен, поэтому на нём работают блокировки posts.stampede.
+
+    С OPTIONS['RAW_VALUES'] байты и целые числа хранятся без pickle.
+    Лишние записи удаляются примерно раз в OPTIONS['CULL_EVERY']
+    записей (по умолчанию MAX_ENTRIES / 100): очистка считает все
+    строки, и кеш может ненадолго превысить MAX_ENTRIES.
+    """
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.raw_values = options.get('RAW_VALUES', False)
+        self.cull_every = options.get('CULL_EVERY', max(
+            self._max_entries // 100, self._cull_frequency))
+        self._local = threading.local()
+
+    @property
+    def _db(self):
+        # соединение своё у каждого потока и у каждого процесса после fork
+        pid, connection = getattr(self._local, 'db', (None, None))
+        if pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5,
+                                         isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS cache (key TEXT PRIMARY KEY, '
+                'value BLOB NOT NULL, expires REAL)')
+            # формат значений записан в файле: строки другого формата
+            # не прочитать, поэтому при его смене кеш очищается
+            value_format = 2 if self.raw_values else 1
+            version, = connection.execute('PRAGMA user_version').fetchone()
+            if version != value_format:
+                connection.execute('DELETE FROM cache')
+                connection.execute(f'PRAGMA user_version = {value_format}')
+            self._local.db = (os.getpid(), connection)
+        return connection
+
+    @contextmanager
+    def _transaction(self):
+        db = self._db
+        # IMMEDIATE: чтение и запись без чужой записи между ними
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            yield db
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        db.execute('COMMIT')
+
+    def _key(self, key, version):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return key
+
+    def _dumps(self, value):
+        if self.raw_values:
+            return value
+        return pickle.dumps(value, self.pickle_protocol)
+
+    def _loads(self, value):
+        return value if self.raw_values else pickle.loads(value)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE key = ? AND expires <= ?',
+                       (key, time.time()))
+            return bool(db.execute(
+                'INSERT OR IGNORE INTO cache VALUES (?, ?, ?)',
+                (key, self._dumps(value),
+                 self.get_backend_timeout(timeout))).rowcount)
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = {self._key(key, version): key for key in keys}
+        if not made:
+            return {}
+        rows = self._db.execute(
+            f'SELECT key, value FROM cache WHERE {LIVE} AND key IN '
+            f'({", ".join("?" * len(made))})', (time.time(), *made))
+        return {made[key]: self._loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self.get_backend_timeout(timeout)
+        with self._transaction() as db:
+            db.executemany(
+                'INSERT OR REPLACE INTO cache VALUES (?, ?, ?)',
+                ((self._key(key, version), self._dumps(value), expires)
+                 for key, value in data.items()))
+        if random.random() < len(data) / self.cull_every:
+            self._cull()
+        return []
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return bool(self._db.execute(
+            f'UPDATE cache SET expires = ? WHERE key = ? AND {LIVE}',
+            (self.get_backend_timeout(timeout), self._key(key, version),
+             time.time())).rowcount)
+
+    def delete(self, key, version=None):
+        return self.delete_many([key], version)
+
+    def delete_many(self, keys, version=None):
+        with self._transaction() as db:
+            return bool(db.executemany(
+                'DELETE FROM cache WHERE key = ?',
+                ((self._key(key, version),) for key in keys)).rowcount)
+
+    def has_key(self, key, version=None):
+        return self._db.execute(
+            f'SELECT 1 FROM cache WHERE key = ? AND {LIVE}',
+            (self._key(key, version), time.time())).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        with self._transaction() as db:
+            row = db.execute(
+                f'SELECT value FROM cache WHERE key = ? AND {LIVE}',
+                (key, time.time())).fetchone()
+            if row is None:
+                raise ValueError(f"Key '{key}' not found")
+            value = self._loads(row[0]) + delta
+            db.execute('UPDATE cache SET value = ? WHERE key = ?',
+                       (self._dumps(value), key))
+        return value
+
+    def clear(self):
+        self._db.execute('DELETE FROM cache')
+
+    def _cull(self):
+        with self._transaction() as db:
+            db.execute('DELETE FROM cache WHERE expires <= ?', (time.time(),))
+            count, = db.execute('SELECT COUNT(*) FROM cache').fetchone()
+            if count > self._max_entries:
+                # сначала те, что истекут раньше; вечные — последними
+                db.execute(
+                    'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                    'ORDER BY expires IS NULL, expires LIMIT ?)',
+                    (count // self._cull_frequency,))
+
+    def usage(self):
+        return _group(self._db.execute('SELECT key, length(value) '
+                                       'FROM cache'))
+
+
+def _group(sizes):
+    keys, total = Counter(), Counter()
+    for key, size in sizes:
+        prefix = key_prefix(key)
+        keys[prefix] += 1
+        total[prefix] += size
+    return {prefix: (keys[prefix], total[prefix]) for prefix in keys}
+
+
+def cache_usage(cache):
+    """
+    Место в кеше по префиксам ключей: {префикс: (ключей, байт)}.
+    Memcached не умеет перечислять ключи, для него NotImplementedError.
+    """
+    backend = getattr(cache, 'backend', cache)
+    if hasattr(backend, 'usage'):
+        return backend.usage()
+    if hasattr(backend, '_cache') and hasattr(backend, '_expire_info'):
+        # LocMemCache: значения уже в pickle
+        return _group((key, len(value))
+                      for key, value in list(backend._cache.items()))
+    if hasattr(backend, 'client') and hasattr(backend.client, 'get_client'):
+        # django-redis
+        client = backend.client.get_client()
+        return _group((key.decode(), client.memory_usage(key) or 0)
+                      for key in client.scan_iter(count=1000))
+    if hasattr(backend, '_dir'):
+        # FileBasedCache хранит только хеши ключей: один общий префикс
+        names = os.listdir(backend._dir) if os.path.isdir(
+            backend._dir) else []
+        return _group(('files', os.path.getsize(
+            os.path.join(backend._dir, name))) for name in names)
+    raise NotImplementedError(
+        f'{type(backend).__name__} не перечисляет ключи')
@@ -1,5 +1,9 @@
 import datetime as dt
-from posts.models import Profile
+
+from django.utils.functional import SimpleLazyObject
+
+from posts.cache import get_user_count
+
 
 def year(request):
     """
@@ -12,8 +16,7 @@ def year(request):
 
 def user_count(request):
     """
-    Добавляет переменную с текущим годом.
+    Добавляет переменную с числом пользователей.
+    Кеш и база не трогаются, пока шаблон не выведет значение.
     """
-    counts = Profile.objects.count()
-
-    return {'user_count': counts}
+    return {'user_count': SimpleLazyObject(get_user_count)}
@@ -0,0 +1,227 @@
+"""
+Лёгкие метрики запросов для продакшена.
+
+Время каждого запроса попадает в гистограмму по имени URL. Для доли
+запросов METRICS_SAMPLE_RATE дополнительно считаются запросы к базе
+и их время, время рендеринга шаблонов и события кеша: они уходят в
+заголовок Server-Timing ответа и в гистограммы /metrics (формат
+Prometheus). Гистограммы живут в памяти своего процесса.
+"""
+import hmac
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends.django import DjangoTemplates
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5,
+                    5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200)
+
+_sample = ContextVar('metrics_sample', default=None)
+
+
+class Sample:
+    """Замеры одного запроса, попавшего в выборку."""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.template_time = 0.0
+        self.template_depth = 0
+        self.cache = {}
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.db_time += time.perf_counter() - started
+
+    def server_timing(self, total):
+        cache = ' '.join(f'{event}={count}'
+                         for event, count in sorted(self.cache.items()))
+        return ', '.join((
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'cache;desc="{cache or "none"}"',
+            f'total;dur={total * 1000:.1f}',
+        ))
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+
+class Registry:
+    """Гистограммы и счётчики по метрике и имени URL."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, view, value, buckets=DURATION_BUCKETS):
+        with self.lock:
+            histogram = self.histograms.get((name, view))
+            if histogram is None:
+                histogram = self.histograms[name, view] = Histogram(buckets)
+            histogram.observe(value)
+
+    def inc(self, name, labels, value=1):
+        with self.lock:
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def clear(self):
+        with self.lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+    def render(self):
+        lines = []
+        with self.lock:
+            for name in sorted({name for name, _ in self.histograms}):
+                lines.append(f'# TYPE {name} histogram')
+                for (metric, view), histogram in sorted(
+                        self.histograms.items()):
+                    if metric != name:
+                        continue
+                    total = 0
+                    bounds = [*histogram.buckets, '+Inf']
+                    for bound, count in zip(bounds, histogram.counts):
+                        total += count
+                        lines.append(f'{name}_bucket{{view="{view}",'
+                                     f'le="{bound}"}} {total}')
+                    lines.append(f'{name}_sum{{view="{view}"}} '
+                                 f'{histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{view}"}} {total}')
+            for name in sorted({name for name, _ in self.counters}):
+                lines.append(f'# TYPE {name} counter')
+                for (metric, labels), value in sorted(self.counters.items()):
+                    if metric != name:
+                        continue
+                    label = ','.join(f'{key}="{item}"' for key, item in labels)
+                    lines.append(f'{name}{{{label}}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def record_cache(event):
+    """Событие кеша (hit/miss/stale) текущего запроса из выборки."""
+    sample = _sample.get()
+    if sample is not None:
+        sample.cache[event] = sample.cache.get(event, 0) + 1
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unmatched'
+
+
+class MetricsMiddleware:
+    """Должен стоять первым в MIDDLEWARE, чтобы видеть весь запрос."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        if random.random() >= settings.METRICS_SAMPLE_RATE:
+            response = self.get_response(request)
+            registry.observe('yatube_request_duration_seconds',
+                             _view_name(request),
+                             time.perf_counter() - started)
+            return response
+        sample = Sample()
+        token = _sample.set(sample)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(sample.execute))
+                response = self.get_response(request)
+        finally:
+            _sample.reset(token)
+        total = time.perf_counter() - started
+        view = _view_name(request)
+        registry.observe('yatube_request_duration_seconds', view, total)
+        registry.observe('yatube_db_queries', view, sample.queries,
+                         QUERY_BUCKETS)
+        registry.observe('yatube_db_duration_seconds', view, sample.db_time)
+        registry.observe('yatube_template_render_seconds', view,
+                         sample.template_time)
+        for event, count in sample.cache.items():
+            registry.inc('yatube_cache_events_total',
+                         (('view', view), ('event', event)), count)
+        response['Server-Timing'] = sample.server_timing(total)
+        return response
+
+
+def _metrics_allowed(request):
+    # за прокси REMOTE_ADDR — адрес прокси, поэтому там нужен токен
+    if settings.METRICS_TOKEN:
+        return hmac.compare_digest(
+            request.META.get('HTTP_AUTHORIZATION', ''),
+            f'Bearer {settings.METRICS_TOKEN}')
+    return request.META.get('REMOTE_ADDR') in settings.INTERNAL_IPS
+
+
+def metrics(request):
+    """
+    Метрики в текстовом формате Prometheus: с токеном METRICS_TOKEN
+    в заголовке Authorization, а без него только с INTERNAL_IPS.
+    """
+    if not _metrics_allowed(request):
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
+
+
+class TimedTemplate:
+    """Шаблон бэкенда, который прибавляет время рендеринга к замеру."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def __getattr__(self, name):
+        return getattr(self.template, name)
+
+    def render(self, context=None, request=None):
+        sample = _sample.get()
+        if sample is None:
+            return self.template.render(context, request)
+        sample.template_depth += 1
+        started = time.perf_counter()
+        try:
+            return self.template.render(context, request)
+        finally:
+            sample.template_depth -= 1
+            if not sample.template_depth:
+                sample.template_time += time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """Бэкенд DjangoTemplates с замером времени рендеринга."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(super().from_string(template_code))
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name))
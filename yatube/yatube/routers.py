@@ -0,0 +1,85 @@
+"""
+Чтение лент с реплик.
+
+ReplicaMiddleware разрешает читать с реплик только безопасным
+запросам (GET, HEAD) к представлениям из REPLICA_READ_VIEWS, всё
+остальное — записи, команды, тесты — идёт в основную базу. После
+любой записи пользователь на DATABASE_REPLICA_LAG секунд
+прикрепляется к основной базе cookie, чтобы видеть свои изменения,
+пока они доходят до реплик.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD')
+
+_state = ContextVar('db_routing', default=None)
+
+
+def replica_settled(timestamp):
+    """
+    Дошли ли до реплик изменения, сделанные в момент timestamp.
+    Пока нет, кешировать собранную с реплики страницу надолго нельзя.
+    """
+    if not settings.DATABASE_REPLICAS:
+        return True
+    return time.time() - timestamp >= settings.DATABASE_REPLICA_LAG
+
+
+class RoutingState:
+    def __init__(self):
+        self.read_replica = False
+        self.wrote = False
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or not state.read_replica:
+            return 'default'
+        return random.choice(settings.DATABASE_REPLICAS)
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            # дальше в этом запросе читаем свою же запись
+            state.wrote = True
+            state.read_replica = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        return db not in settings.DATABASE_REPLICAS
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = RoutingState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote:
+            response.set_cookie(PIN_COOKIE, '1',
+                                max_age=settings.DATABASE_REPLICA_LAG,
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = _state.get()
+        state.read_replica = bool(
+            settings.DATABASE_REPLICAS
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and request.resolver_match.view_name
+            in settings.REPLICA_READ_VIEWS)
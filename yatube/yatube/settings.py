@@ -11,8 +11,13 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+import tempfile
 from django.urls import reverse_lazy
 
+from yatube.caches import cache_config
+from yatube.database import database_config
+from yatube.templating import template_loaders
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -42,11 +47,14 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'posts.apps.PostsConfig',
     'about.apps.AboutConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
     # 'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'yatube.metrics.MetricsMiddleware',
+    'yatube.routers.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -57,18 +65,34 @@ MIDDLEWARE = [
     # 'debug_toolbar.middleware.DebugToolbarMiddleware'
 ]
 
+# API отвечает на ошибку CSRF в JSON, остальной сайт — страницей Django
+CSRF_FAILURE_VIEW = 'api.views.csrf_failure'
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+# /metrics без токена открыт только с INTERNAL_IPS, что верно лишь без
+# прокси: за ним REMOTE_ADDR — адрес самого прокси. Там задайте токен,
+# который Prometheus передаёт как bearer_token
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Доля запросов, для которых считаются запросы к базе, время шаблонов
+# и события кеша (заголовок Server-Timing и /metrics)
+METRICS_SAMPLE_RATE = 0.01
+
 ROOT_URLCONF = 'yatube.urls'
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
+# Профиль продакшена: скомпилированные шаблоны хранятся в памяти
+# процесса, постоянные include встраиваются при компиляции
+TEMPLATE_CACHE = os.environ.get('TEMPLATE_CACHE',
+                                '0' if DEBUG else '1') == '1'
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'yatube.metrics.TimedDjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': template_loaders(TEMPLATE_CACHE),
             'context_processors': [
                 'yatube.context_processors.year',
                 'yatube.context_processors.user_count',
@@ -77,7 +101,11 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
-            'libraries': {'user_filters': 'templatetags.user_filters', },
+            'libraries': {'user_filters': 'templatetags.user_filters',
+                          'swr_cache': 'templatetags.swr_cache',
+                          'ready_thumbnail': 'templatetags.ready_thumbnail',
+                          'post_cards': 'templatetags.post_cards',
+                          },
         },
     },
 ]
@@ -94,11 +122,28 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+    'default': database_config(
+        os.environ.get('DATABASE_URL',
+                       'sqlite:///' + os.path.join(BASE_DIR, 'db.sqlite3')),
+        conn_max_age=int(os.environ.get('DATABASE_CONN_MAX_AGE', 60)),
+        pool_size=int(os.environ.get('DATABASE_POOL_SIZE', 0))),
 }
+# Реплики для чтения лент: адреса через запятую в DATABASE_REPLICA_URLS.
+# В тестах реплика — зеркало основной базы
+DATABASE_REPLICAS = []
+for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(','):
+    if url:
+        DATABASE_REPLICAS.append(f'replica_{len(DATABASE_REPLICAS) + 1}')
+        DATABASES[DATABASE_REPLICAS[-1]] = dict(
+            database_config(url, DATABASES['default']['CONN_MAX_AGE']),
+            TEST={'MIRROR': 'default'})
+DATABASE_ROUTERS = ['yatube.routers.ReplicaRouter']
+# Отставание реплик, секунд: столько после записи читаем основную базу
+DATABASE_REPLICA_LAG = int(os.environ.get('DATABASE_REPLICA_LAG', 5))
+REPLICA_READ_VIEWS = ('index', 'discussed', 'group', 'profile', 'post',
+                      'follow_index')
+# Сколько SQLite ждёт снятия чужой блокировки записи, миллисекунд
+SQLITE_BUSY_TIMEOUT = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))
 
 
 # Password validation
@@ -153,12 +198,64 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Общий для процессов кеш: CACHE_URL — sqlite:///, file:///, redis://,
+# memcached:// или locmem://. Страницы крупнее CACHE_COMPRESS_MIN_BYTES
+# хранятся сжатыми. Тесты запускаются с yatube.settings_test, где кеш
+# живёт в памяти процесса
+CACHE_URL = os.environ.get('CACHE_URL', 'sqlite:///' + os.path.join(
+    tempfile.gettempdir(), 'yatube-cache.sqlite3'))
 CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+    'default': cache_config(
+        CACHE_URL,
+        compress_min_bytes=int(os.environ.get('CACHE_COMPRESS_MIN_BYTES',
+                                              1024))),
 }
+# Полный пересчёт числа пользователей для подвала, секунд
+USER_COUNT_TIMEOUT = 60 * 60
+# Ленты сбрасываются по сигналам изменения постов, поэтому TTL длинный
+FEED_CACHE_TIMEOUT = 60 * 60 * 3
+# Защита от лавины пересчётов: сколько отдавать устаревшую страницу после
+# истечения срока, время блокировки пересчёта и коэффициент раннего
+# пересчёта (XFetch)
+CACHE_STALE_TIMEOUT = 60 * 10
+CACHE_LOCK_TIMEOUT = 10
+CACHE_EARLY_BETA = 1.0
+# Миниатюры создаются пулом процессов после загрузки; 0 — сразу в запросе
+THUMBNAIL_WORKERS = 2
+THUMBNAIL_PLACEHOLDER_URL = ('data:image/gif;base64,R0lGODlhAQABAIAAAAAAAP'
+                             '///yH5BAEAAAAALAAAAAABAAEAAAIBRAA7')
+# Нормализация загружаемых изображений
+FILE_UPLOAD_HANDLERS = [
+    'posts.uploads.ImageUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+IMAGE_UPLOAD_MAX_BYTES = 20 * 1024 * 1024
+IMAGE_UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+IMAGE_UPLOAD_MAX_SIZE = (2560, 2560)
+IMAGE_UPLOAD_QUALITY = 85
+# Адаптивные варианты изображений постов для <picture>/srcset
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1920)
+IMAGE_VARIANT_FORMATS = ('AVIF', 'WEBP', 'JPEG')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_FALLBACK_WIDTH = 960
+# сколько помнить, что вариантов изображения ещё нет, секунд
+IMAGE_VARIANT_MISS_TIMEOUT = 60
 PAGINATOR_COUNT = 10
+# Потоковая страница всех постов автора: постов в пачке курсора и карточек
+STREAM_CHUNK_SIZE = 100
+COMMENTS_PAGE_SIZE = 20
+# Полнотекстовый поиск: 'auto' — FTS5 на SQLite, иначе обратный индекс
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_TERMS = 10
+SEARCH_ADMIN_LIMIT = 1000
+# Лента подписок: выше этих порогов посты автора не рассылаются по лентам
+# подписчиков, а подмешиваются при чтении
+FEED_FANOUT_MAX_FOLLOWERS = 1000
+FEED_BACKFILL_MAX_POSTS = 1000
+# Приблизительный подсчёт страниц: COUNT(*) только на несколько страниц вперёд
+PAGINATOR_APPROXIMATE_COUNT = False
+PAGINATOR_LOOKAHEAD_PAGES = 5
 
 """
 STATIC_URL = '/static/'
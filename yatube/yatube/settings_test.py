@@ -0,0 +1,12 @@
+"""
+Настройки для тестов.
+
+Кеш по умолчанию живёт в памяти процесса: общий файловый кеш
+сохраняется между прогонами, и тесты видели бы страницы, закешированные
+прошлым запуском. CACHE_URL из окружения по-прежнему главнее.
+"""
+import os
+
+os.environ.setdefault('CACHE_URL', 'locmem://')
+
+from yatube.settings import *  # noqa: E402,F401,F403
@@ -0,0 +1,106 @@
+"""
+Загрузка шаблонов в продакшене.
+
+С TEMPLATE_CACHE=1 шаблоны компилируются один раз на процесс и
+хранятся в памяти загрузчика Loader. При компиляции он подставляет
+в {% include "имя" %} с постоянным именем уже скомпилированный
+шаблон, так что include внутри цикла ленты не ищет его заново.
+warm_templates() компилирует шаблоны приложений при запуске, до
+первого запроса.
+"""
+import os
+
+from django.apps import apps
+from django.template import TemplateDoesNotExist, engines
+from django.template.backends.django import DjangoTemplates
+from django.template.base import FilterExpression
+from django.template.loader_tags import IncludeNode
+from django.template.loaders import cached
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+# шаблоны этих приложений и каталогов компилируются при запуске
+WARM_TEMPLATES = ('posts', 'users', 'about', 'misc')
+
+
+def template_loaders(cache=False):
+    """Значение OPTIONS['loaders'] для профиля разработки или продакшена."""
+    if not cache:
+        return list(LOADERS)
+    return [('yatube.templating.Loader', LOADERS)]
+
+
+class InlinedTemplate:
+    """Постоянное имя шаблона include, заменённое самим шаблоном."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def resolve(self, context):
+        return self.template
+
+
+class Loader(cached.Loader):
+    """Кеширующий загрузчик, встраивающий постоянные include."""
+
+    def get_template(self, template_name, skip=None):
+        template = super().get_template(template_name, skip)
+        # шаблон уже в кеше, поэтому рекурсивный include его не зациклит
+        if not getattr(template, 'includes_inlined', False):
+            template.includes_inlined = True
+            self.inline_includes(template)
+        return template
+
+    def inline_includes(self, template):
+        for node in template.nodelist.get_nodes_by_type(IncludeNode):
+            name = node.template
+            if (not isinstance(name, FilterExpression) or name.filters
+                    or not isinstance(name.var, str)):
+                continue
+            try:
+                node.template = InlinedTemplate(
+                    self.engine.get_template(name.var))
+            except TemplateDoesNotExist:
+                # ошибка останется на время рендеринга, как без кеша
+                continue
+
+
+def _template_dirs(engine):
+    for directory in engine.dirs:
+        yield None, directory
+    for config in apps.get_app_configs():
+        directory = os.path.join(config.path, 'templates')
+        if os.path.isdir(directory):
+            yield config.label, directory
+
+
+def warm_templates(names=WARM_TEMPLATES):
+    """
+    Компилирует шаблоны из приложений и каталогов шаблонов names во
+    всех бэкендах DjangoTemplates. Возвращает имена шаблонов.
+    """
+    compiled = []
+    for backend in engines.all():
+        if isinstance(backend, DjangoTemplates):
+            compiled.extend(_warm(backend.engine, names))
+    return compiled
+
+
+def _warm(engine, names):
+    compiled = []
+    for label, directory in _template_dirs(engine):
+        for root, _, files in os.walk(directory):
+            for filename in sorted(files):
+                if not filename.endswith('.html'):
+                    continue
+                template_name = os.path.relpath(
+                    os.path.join(root, filename), directory
+                ).replace(os.sep, '/')
+                if (label not in names
+                        and template_name.split('/')[0] not in names):
+                    continue
+                engine.get_template(template_name)
+                compiled.append(template_name)
+    return compiled